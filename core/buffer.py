@@ -0,0 +1,206 @@
+# core/buffer.py
+from array import array
+from core.metric import MetricBatch
+
+
+class RingBuffer:
+    """
+    Fixed-capacity ring of entries addressed by absolute sequence numbers.
+
+    Slots are preallocated once. Appending past capacity overwrites the
+    oldest entries (drop-oldest) without moving the rest, and reading a
+    range copies only that range, in at most two list slices.
+
+    self.start is the sequence number of the oldest stored entry and
+    self.end is one past the newest, so len(self) == end - start.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self.start = 0
+        self.end = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def extend(self, items):
+        """
+        Append items, overwriting the oldest entries when full.
+
+        Returns:
+            int: Number of entries dropped (stored or incoming) to make room
+        """
+        count = len(items)
+        if count == 0:
+            return 0
+        overflow = max(0, len(self) + count - self.capacity)
+        if count > self.capacity:
+            # Only the newest capacity items can ever be stored
+            skipped = count - self.capacity
+            items = items[skipped:]
+            self.end += skipped
+            count = self.capacity
+        pos = self.end % self.capacity
+        first = min(count, self.capacity - pos)
+        self._slots[pos:pos + first] = items[:first]
+        if first < count:
+            self._slots[:count - first] = items[first:]
+        self.end += count
+        self.start = max(self.start, self.end - self.capacity)
+        self.dropped += overflow
+        return overflow
+
+    def slice(self, lo, hi):
+        """Return a copy of the entries with sequence numbers in [lo, hi)."""
+        lo = max(lo, self.start)
+        hi = min(hi, self.end)
+        if hi <= lo:
+            return []
+        first = lo % self.capacity
+        last = first + (hi - lo)
+        if last <= self.capacity:
+            return self._slots[first:last]
+        return self._slots[first:] + self._slots[:last - self.capacity]
+
+    def discard_until(self, seq):
+        """Release the entries before seq so their slots no longer hold references."""
+        seq = min(seq, self.end)
+        while self.start < seq:
+            self._slots[self.start % self.capacity] = None
+            self.start += 1
+
+
+class MetricRing(RingBuffer):
+    """
+    RingBuffer for metric points stored column-wise.
+
+    Series ids, values and timestamps live in three preallocated arrays, so
+    a buffered point costs 24 bytes and no Python object. extend() accepts a
+    MetricBatch (or Metric objects) and slice() returns a MetricBatch.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._series_ids = array("q", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._timestamps = array("q", bytes(8 * capacity))
+        self.start = 0
+        self.end = 0
+        self.dropped = 0
+
+    def extend(self, items):
+        batch = MetricBatch.from_metrics(items)
+        count = len(batch)
+        if count == 0:
+            return 0
+        overflow = max(0, len(self) + count - self.capacity)
+        if count > self.capacity:
+            skipped = count - self.capacity
+            batch = batch[skipped:]
+            self.end += skipped
+            count = self.capacity
+        pos = self.end % self.capacity
+        first = min(count, self.capacity - pos)
+        for column, source in ((self._series_ids, batch.series_ids), (self._values, batch.values), (self._timestamps, batch.timestamps)):
+            column[pos:pos + first] = source[:first]
+            if first < count:
+                column[:count - first] = source[first:]
+        self.end += count
+        self.start = max(self.start, self.end - self.capacity)
+        self.dropped += overflow
+        return overflow
+
+    def slice(self, lo, hi):
+        lo = max(lo, self.start)
+        hi = min(hi, self.end)
+        if hi <= lo:
+            return MetricBatch()
+        first = lo % self.capacity
+        last = first + (hi - lo)
+        columns = []
+        for column in (self._series_ids, self._values, self._timestamps):
+            if last <= self.capacity:
+                columns.append(column[first:last])
+            else:
+                columns.append(column[first:] + column[:last - self.capacity])
+        return MetricBatch(*columns)
+
+    def discard_until(self, seq):
+        # Nothing to release: the columns hold plain numbers
+        self.start = max(self.start, min(seq, self.end))
+
+
+class SharedBuffer:
+    """
+    Bounded backlog shared by several outputs, each with its own cursor.
+
+    Entries are appended once to a RingBuffer and every registered consumer
+    (output) reads from its own position. A consumer acknowledges what it
+    wrote, which moves only its cursor forward, so a healthy output never
+    sees the same entries twice while a failing one keeps its own backlog
+    for the next retry. Entries are released once every consumer has
+    acknowledged them; when the ring is full the oldest are dropped (or
+    handed to the spill callback) in O(1) per entry.
+    """
+
+    def __init__(self, max_size, spill=None, ring=None):
+        self.max_size = max_size
+        # Optional callback(consumer, entries) receiving what a consumer loses on overflow
+        self.spill = spill
+        self.ring = ring if ring is not None else RingBuffer(max_size)
+        self.cursors = {}
+        self.dropped = {}
+
+    def register(self, consumer):
+        """Start tracking a consumer at the current end of the backlog."""
+        if consumer not in self.cursors:
+            self.cursors[consumer] = self.ring.end
+            self.dropped[consumer] = 0
+
+    def append(self, items):
+        """
+        Add items to the backlog, dropping the oldest entries over max_size.
+
+        Returns:
+            int: Number of entries dropped to stay within max_size
+        """
+        ring = self.ring
+        new_end = ring.end + len(items)
+        new_start = max(ring.start, new_end - ring.capacity)
+        for consumer, cursor in self.cursors.items():
+            if cursor < new_start:
+                if self.spill is not None:
+                    lost = ring.slice(cursor, new_start)
+                    if new_start > ring.end:
+                        # Part of the incoming batch does not fit either
+                        lost.extend(items[max(0, cursor - ring.end):new_start - ring.end])
+                    self.spill(consumer, lost)
+                self.dropped[consumer] += new_start - cursor
+                self.cursors[consumer] = new_start
+        return ring.extend(items)
+
+    def pending(self, consumer, limit=None):
+        """Return up to limit entries the consumer has not acknowledged yet."""
+        cursor = self.cursors[consumer]
+        end = self.ring.end if limit is None else min(self.ring.end, cursor + limit)
+        return self.ring.slice(cursor, end)
+
+    def ack(self, consumer, count):
+        """Mark the next count pending entries as written by the consumer."""
+        self.cursors[consumer] = min(self.cursors[consumer] + count, self.ring.end)
+        self.ring.discard_until(min(self.cursors.values()))
+
+    @property
+    def occupancy(self):
+        """Fraction of the buffer capacity currently in use."""
+        return len(self.ring) / self.ring.capacity
+
+    @property
+    def total_dropped(self):
+        """Entries dropped from the ring since startup."""
+        return self.ring.dropped
+
+    def __len__(self):
+        return len(self.ring)
@@ -0,0 +1,131 @@
+# core/checkpoint.py
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# name -> (save, restore, volatile)
+_providers = {}
+
+# Attempts at snapshotting a provider that other threads are mutating
+SAVE_ATTEMPTS = 3
+
+
+def register_state(name, save, restore, volatile=False):
+    """
+    Register a piece of in-process state to keep across restarts.
+
+    save() returns a JSON-serializable snapshot and restore(state) loads one
+    back. save() may run while other threads update the state; if it fails
+    with "changed size during iteration" it is retried. Volatile state
+    (counter baselines) is only restored from a recent checkpoint taken
+    since the last boot, since kernel counters start over after a reboot
+    and a baseline from long ago would produce a rate averaged over the
+    whole gap.
+    """
+    _providers[name] = (save, restore, volatile)
+
+
+def _boot_id():
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class Checkpoint:
+    """
+    Local JSON file holding registered state, written periodically and on shutdown.
+
+    The file is replaced atomically (write to a temporary file, fsync,
+    rename), so a crash mid-write leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, path, interval=60, max_age=300):
+        self.path = path
+        self.interval = interval
+        # Seconds after which volatile state in the file is no longer trusted
+        self.max_age = max_age
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        # name -> last state written or restored, as JSON, kept when a save fails
+        self._saved = {}
+
+    def load(self):
+        """Restore the state of every registered provider found in the checkpoint."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[{datetime.now().isoformat()}] [Checkpoint] Ignoring unreadable checkpoint {self.path}: {e}")
+            return
+
+        age = time.time() - data.get("saved_at", 0)
+        fresh = age <= self.max_age and data.get("boot_id") == _boot_id()
+        restored = []
+        for name, state in data.get("state", {}).items():
+            provider = _providers.get(name)
+            if provider is None:
+                continue
+            _, restore, volatile = provider
+            if volatile and not fresh:
+                continue
+            try:
+                restore(state)
+                restored.append(name)
+                self._saved[name] = json.dumps(state, separators=(",", ":"))
+            except Exception as e:
+                print(f"[{datetime.now().isoformat()}] [Checkpoint] Could not restore {name}: {e}")
+        print(f"[{datetime.now().isoformat()}] [Checkpoint] Restored {len(restored)} state entries from {self.path} (saved {age:.0f}s ago)")
+
+    def save(self):
+        """Write the state of every registered provider to the checkpoint file."""
+        with self._lock:
+            for name, (save, _, _) in list(_providers.items()):
+                state = self._snapshot(name, save)
+                if state is not None:
+                    self._saved[name] = state
+            # Provider states are already encoded; splice them into the document
+            header = json.dumps({"saved_at": time.time(), "boot_id": _boot_id()}, separators=(",", ":"))
+            state = ",".join(f"{json.dumps(name)}:{encoded}" for name, encoded in self._saved.items())
+
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write(header[:-1] + ',"state":{' + state + '}}')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"[{datetime.now().isoformat()}] [Checkpoint] Could not write {self.path}: {e}")
+            self._last_save = time.monotonic()
+
+    def _snapshot(self, name, save):
+        """
+        Return a provider's state encoded as JSON, or None if it could not be taken.
+
+        Providers hand out their live dicts and sets, which input and flush
+        threads keep updating, so both taking and encoding the snapshot can
+        fail with "changed size during iteration"; that is retried. On
+        failure the state from the previous save stays in the file.
+        """
+        for _ in range(SAVE_ATTEMPTS):
+            try:
+                return json.dumps(save(), separators=(",", ":"))
+            except RuntimeError as e:
+                error = e
+            except Exception as e:
+                error = e
+                break
+        kept = "keeping the previous state" if name in self._saved else "not saved"
+        print(f"[{datetime.now().isoformat()}] [Checkpoint] Could not save {name} ({kept}): {error}")
+        return None
+
+    def maybe_save(self):
+        """Save if at least interval seconds have passed since the last save."""
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
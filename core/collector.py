@@ -1,13 +1,122 @@
 # core/collector.py
+import math
+import os
+import queue
+import threading
 import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from core.metric import Metric
+from core.buffer import MetricRing, SharedBuffer
+from core.metric import Metric, MetricBatch
+from core.series import registry
+from utils.duration import parse_duration_ms
+
+class _GatherFuture(Future):
+    """Future that also records when a worker started running it."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.started_at = None
+
+
+class _DaemonPool:
+    """
+    Bounded pool of daemon worker threads with the submit/shutdown API of ThreadPoolExecutor.
+
+    ThreadPoolExecutor workers are joined at interpreter exit, so one input
+    that never returns would keep the agent alive forever. These workers are
+    daemon threads: an abandoned gather is simply dropped when the process exits.
+    A worker whose task was abandoned no longer counts toward max_workers, so
+    tasks queued behind it still get a worker.
+    """
+
+    def __init__(self, max_workers=None, thread_name_prefix="rtcollector-input"):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.thread_name_prefix = thread_name_prefix
+        self._tasks = queue.SimpleQueue()
+        self._threads = []
+        self._started_threads = 0
+        # Workers not running an abandoned task
+        self._workers = 0
+        self._abandoned = set()
+        self._idle = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn, *args):
+        if self._shutdown:
+            raise RuntimeError("cannot submit after shutdown")
+        future = _GatherFuture()
+        self._tasks.put((future, fn, args))
+        # Start a worker unless one is idle, up to max_workers
+        if not self._idle.acquire(blocking=False):
+            with self._lock:
+                if self._workers < self.max_workers:
+                    self._start_worker()
+        return future
+
+    def abandon(self, future):
+        """Stop counting the worker running future; it exits once the task returns."""
+        with self._lock:
+            if future.done() or future in self._abandoned:
+                return
+            self._abandoned.add(future)
+            self._workers -= 1
+            if self._tasks.qsize():
+                self._start_worker()
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._work, name=f"{self.thread_name_prefix}_{self._started_threads}", daemon=True)
+        self._started_threads += 1
+        self._workers += 1
+        self._threads.append(thread)
+        thread.start()
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, fn, args = task
+            future.started_at = time.monotonic()
+            future.started.set()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._lock:
+                if future in self._abandoned:
+                    # A replacement took this worker's place
+                    self._abandoned.discard(future)
+                    self._threads.remove(threading.current_thread())
+                    return
+            self._idle.release()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._shutdown = True
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not None:
+                    task[0].cancel()
+                    task[0].started.set()
+        for _ in list(self._threads):
+            self._tasks.put(None)
+        if wait:
+            for thread in list(self._threads):
+                thread.join()
 
 class Collector:
-    def __init__(self, interval, inputs, outputs, tags=None, logs_only_outputs=None, metrics_only_outputs=None, flush_interval=None, max_buffer_size=5000, warn_on_buffer=True):
+    def __init__(self, interval, inputs, outputs, tags=None, logs_only_outputs=None, metrics_only_outputs=None, flush_interval=None, max_buffer_size=5000, warn_on_buffer=True, concurrent_inputs=False, max_workers=4, input_timeout=None, background_flush=False, flush_batch_size=None, spool=None, write_batch_size=None, checkpoint=None, processors=None, series_expiry="1h"):
         self.interval = interval
         self.flush_interval = flush_interval or interval
         self.max_buffer_size = max_buffer_size
+        self.write_batch_size = write_batch_size
         self.warn_on_buffer = warn_on_buffer
         self.debug = False  # Default to non-debug mode
         if self.flush_interval < self.interval:
@@ -17,208 +126,593 @@ class Collector:
         self.logs_only_outputs = logs_only_outputs or []
         self.metrics_only_outputs = metrics_only_outputs or []
         self.tags = tags or {}
+        # Series id -> id of the same series with the global tags merged in
+        self._tagged_ids = registry.cache()
+        # Series not seen for this long are dropped from the registry (0 keeps them forever)
+        self.series_expiry = parse_duration_ms(series_expiry) / 1000 if series_expiry else 0
+        self._next_series_expiry = time.monotonic() + self.series_expiry
         self._input_states = {}
         self._last_flush_time = time.time()
-        self.buffered_metrics = []
-        self.buffered_logs = []
+        # Optional disk spool receiving what overflows the in-memory buffers
+        self.spool = spool
+        # Optional core.checkpoint.Checkpoint saved periodically and on shutdown
+        self.checkpoint = checkpoint
+        # Processors applied in order to each input's metrics before buffering
+        self.processors = processors or []
+        # Processors that restrict which outputs a series is written to
+        self._routers = [processor for processor in self.processors if getattr(processor, "routes", None)]
+        # output name -> {series_id: write to this output?}
+        self._route_decisions = {}
+        self._last_replay = {}
+        spill = self._spill if spool is not None else None
+        # One backlog per data kind, with a cursor per output
+        self.buffered_metrics = SharedBuffer(max_buffer_size, spill=spill, ring=MetricRing(max_buffer_size))
+        self.buffered_logs = SharedBuffer(max_buffer_size, spill=spill)
+        self._routes = self._build_routes()
+        # Concurrent gathering: bounded worker pool with per-plugin timeouts
+        self.concurrent_inputs = concurrent_inputs
+        self.max_workers = max_workers
+        self.input_timeout = input_timeout
+        self._executor = None
+        self._input_timeouts = {}
+        self._input_intervals = {}
+        self._pending_inputs = {}
+        # Background flushing: the collection loop hands batches to a flusher thread
+        self.background_flush = background_flush
+        self.flush_batch_size = flush_batch_size
+        self._flush_queue = queue.Queue()
+        self._flush_thread = None
+        self._stop_event = threading.Event()
 
-    def run(self):
-        while True:
-            print(f"[{datetime.now().isoformat()}] [Collector] Collecting metrics...")
-            metrics_to_send = []
-            logs_to_send = []
+    def _resolve_input(self, input_entry):
+        """Return the (plugin_name, handler) pair for an entry of self.inputs."""
+        if isinstance(input_entry, dict):
+            plugin_name, input_func = list(input_entry.items())[0]
+        else:
+            input_func = input_entry
+            plugin_module = getattr(input_func, "__module__", "unknown")
+            plugin_name = plugin_module.split('.')[-1]
+            if plugin_name == "__main__" or plugin_name.startswith("<"):
+                plugin_name = getattr(input_func, "__name__", "anonymous")
+                if hasattr(input_func, "_is_persistent") and input_func._is_persistent:
+                    input_handler = input_func
+                    self._input_states[plugin_name] = input_handler
 
-            for input_entry in self.inputs:
-                if isinstance(input_entry, dict):
-                    plugin_name, input_func = list(input_entry.items())[0]
-                else:
-                    input_func = input_entry
-                    plugin_module = getattr(input_func, "__module__", "unknown")
-                    plugin_name = plugin_module.split('.')[-1]
-                    if plugin_name == "__main__" or plugin_name.startswith("<"):
-                        plugin_name = getattr(input_func, "__name__", "anonymous")
-                        if hasattr(input_func, "_is_persistent") and input_func._is_persistent:
-                            input_handler = input_func
-                            self._input_states[plugin_name] = input_handler
-
-                # Cache input state or handler if needed
-                if plugin_name not in self._input_states and not (hasattr(input_func, "_is_persistent") and input_func._is_persistent):
-                    # If the input_func has a collect method, call it once to initialize and cache result
-                    if hasattr(input_func, "collect") and callable(input_func.collect):
-                        self._input_states[plugin_name] = input_func.collect()
-                    else:
-                        self._input_states[plugin_name] = input_func
-
-                input_handler = self._input_states[plugin_name]
-
-                start = time.time()
-                try:
-                    # If input_handler is callable, call it to get data, else assume it's already data
-                    start_ns = time.time_ns()
-                    if callable(input_handler):
-                        data = input_handler()
-                    else:
-                        data = input_handler
-                    duration = time.time() - start
-                    gather_time_ns = time.time_ns() - start_ns
-                    
-                    # Update internal stats if the internal module is imported
-                    try:
-                        from inputs.internal import update_gather_stats
-                        update_gather_stats(plugin_name, "gather_time_ns", gather_time_ns)
-                    except ImportError:
-                        pass
-                    # Determine plugin keys for logs and metrics
-                    plugin_logs_key = f"{plugin_name}_logs"
-                    plugin_metrics_key = f"{plugin_name}_metrics"
-                    count = 0
-                    if isinstance(data, dict):
-                        if plugin_metrics_key in data:
-                            for item in data[plugin_metrics_key]:
-                                if isinstance(item, Metric):
-                                    item.labels.update(self.tags)
-                                    metrics_to_send.append(item)
-                                    count += 1
-                                    # Update internal stats
-                                    try:
-                                        from inputs.internal import update_collector_stats
-                                        update_collector_stats("metrics_gathered")
-                                        update_gather_stats(plugin_name, "metrics_gathered", 1)
-                                    except ImportError:
-                                        pass
-                        if plugin_logs_key in data:
-                            for log in data[plugin_logs_key]:
-                                if isinstance(log, dict):
-                                    logs_to_send.append(log)
-                                    count += 1
-                    elif isinstance(data, tuple) and len(data) == 2:
-                        metrics_part, logs_part = data
-                        for item in metrics_part:
-                            if isinstance(item, Metric):
-                                item.labels.update(self.tags)
-                                metrics_to_send.append(item)
-                                count += 1
-                        for log in logs_part:
-                            if isinstance(log, dict):
-                                logs_to_send.append(log)
-                                count += 1
-                    else:
-                        for item in data:
-                            if isinstance(item, Metric):
-                                item.labels.update(self.tags)
-                                metrics_to_send.append(item)
-                            elif isinstance(item, dict):
-                                logs_to_send.append(item)
-                            count += 1
-                    slow_flag = " ⚠️" if duration > 1.0 else ""
-                    print(f"[{datetime.now().isoformat()}] [{plugin_name}] Collected {count} metrics in {duration:.2f}s{slow_flag}")
-                    
-                    # Sample metrics are completely disabled unless in debug mode
-                except Exception as e:
-                    print(f"[{datetime.now().isoformat()}] [Collector] Error in input plugin '{plugin_name}': {e}")
-                    # Update internal stats for errors
-                    try:
-                        from inputs.internal import update_collector_stats, update_gather_stats
-                        update_collector_stats("gather_errors")
-                        update_gather_stats(plugin_name, "gather_errors", 1)
-                    except ImportError:
-                        pass
+        # Cache input state or handler if needed
+        if plugin_name not in self._input_states and not (hasattr(input_func, "_is_persistent") and input_func._is_persistent):
+            # If the input_func has a collect method, call it once to initialize and cache result
+            if hasattr(input_func, "collect") and callable(input_func.collect):
+                self._input_states[plugin_name] = input_func.collect()
+            else:
+                self._input_states[plugin_name] = input_func
+
+        if plugin_name not in self._input_timeouts:
+            self._input_timeouts[plugin_name] = getattr(input_func, "gather_timeout", None) or self.input_timeout
+            self._input_intervals[plugin_name] = getattr(input_func, "interval", None) or self.interval
+
+        return plugin_name, self._input_states[plugin_name]
+
+    def _gather_input(self, plugin_name, input_handler):
+        """
+        Run a single input plugin and sort its output into metrics and logs.
+
+        Returns:
+            tuple: (MetricBatch, list of log dicts) gathered from the plugin. Errors are logged
+            and counted, and produce empty lists.
+        """
+        metrics_to_send = MetricBatch()
+        logs_to_send = []
+        start = time.time()
+        try:
+            # If input_handler is callable, call it to get data, else assume it's already data
+            start_ns = time.time_ns()
+            if callable(input_handler):
+                data = input_handler()
+            else:
+                data = input_handler
+            duration = time.time() - start
+            gather_time_ns = time.time_ns() - start_ns
 
-            self.buffered_metrics.extend(metrics_to_send)
-            print(f"[{datetime.now().isoformat()}] [Collector] Buffered {len(self.buffered_metrics)} metrics.")
-            self.buffered_logs.extend(logs_to_send)
-            print(f"[{datetime.now().isoformat()}] [Collector] Buffered {len(self.buffered_logs)} logs.")
-            metric_progress = int((len(self.buffered_metrics) / self.max_buffer_size) * 20)
-            log_progress = int((len(self.buffered_logs) / self.max_buffer_size) * 20)
-            metric_bar = f"\033[92m{'#' * metric_progress}\033[90m{'.' * (20 - metric_progress)}\033[0m"
-            log_bar = f"\033[94m{'#' * log_progress}\033[90m{'.' * (20 - log_progress)}\033[0m"
-            print(f"[{datetime.now().isoformat()}] [Collector] Metric buffer: [{metric_bar}] {len(self.buffered_metrics)}/{self.max_buffer_size}")
-            print(f"[{datetime.now().isoformat()}] [Collector] Log buffer:    [{log_bar}] {len(self.buffered_logs)}/{self.max_buffer_size}")
-
-            now = time.time()
-            if now - self._last_flush_time >= self.flush_interval:
-                if len(self.buffered_metrics) > self.max_buffer_size:
-                    if self.warn_on_buffer:
-                        print(f"[WARNING] Buffered metrics exceeded max buffer size ({self.max_buffer_size}). Dropping oldest entries.")
-                    dropped_count = len(self.buffered_metrics) - self.max_buffer_size
-                    self.buffered_metrics = self.buffered_metrics[-self.max_buffer_size:]
-                    
-                    # Update internal stats for dropped metrics
+            # Update internal stats if the internal module is imported
+            try:
+                from inputs.internal import update_gather_stats
+                update_gather_stats(plugin_name, "gather_time_ns", gather_time_ns)
+            except ImportError:
+                pass
+            # Determine plugin keys for logs and metrics
+            plugin_logs_key = f"{plugin_name}_logs"
+            plugin_metrics_key = f"{plugin_name}_metrics"
+            count = 0
+            if isinstance(data, dict):
+                if plugin_metrics_key in data and isinstance(data[plugin_metrics_key], MetricBatch):
+                    batch = data[plugin_metrics_key]
+                    metrics_to_send.extend(batch)
+                    count += len(batch)
                     try:
                         from inputs.internal import update_collector_stats
-                        update_collector_stats("metrics_dropped", dropped_count)
+                        update_collector_stats("metrics_gathered", len(batch))
+                        update_gather_stats(plugin_name, "metrics_gathered", len(batch))
                     except ImportError:
                         pass
+                elif plugin_metrics_key in data:
+                    for item in data[plugin_metrics_key]:
+                        if isinstance(item, Metric):
+                            metrics_to_send.add(item)
+                            count += 1
+                            # Update internal stats
+                            try:
+                                from inputs.internal import update_collector_stats
+                                update_collector_stats("metrics_gathered")
+                                update_gather_stats(plugin_name, "metrics_gathered", 1)
+                            except ImportError:
+                                pass
+                if plugin_logs_key in data:
+                    for log in data[plugin_logs_key]:
+                        if isinstance(log, dict):
+                            logs_to_send.append(log)
+                            count += 1
+            elif isinstance(data, tuple) and len(data) == 2:
+                metrics_part, logs_part = data
+                if isinstance(metrics_part, MetricBatch):
+                    metrics_to_send.extend(metrics_part)
+                    count += len(metrics_part)
+                    metrics_part = ()
+                for item in metrics_part:
+                    if isinstance(item, Metric):
+                        metrics_to_send.add(item)
+                        count += 1
+                for log in logs_part:
+                    if isinstance(log, dict):
+                        logs_to_send.append(log)
+                        count += 1
+            elif isinstance(data, MetricBatch):
+                metrics_to_send.extend(data)
+                count += len(data)
+            else:
+                for item in data:
+                    if isinstance(item, Metric):
+                        metrics_to_send.add(item)
+                    elif isinstance(item, dict):
+                        logs_to_send.append(item)
+                    count += 1
+            slow_flag = " ⚠️" if duration > 1.0 else ""
+            print(f"[{datetime.now().isoformat()}] [{plugin_name}] Collected {count} metrics in {duration:.2f}s{slow_flag}")
+
+            # Sample metrics are completely disabled unless in debug mode
+        except Exception as e:
+            print(f"[{datetime.now().isoformat()}] [Collector] Error in input plugin '{plugin_name}': {e}")
+            # Update internal stats for errors
+            try:
+                from inputs.internal import update_collector_stats, update_gather_stats
+                update_collector_stats("gather_errors")
+                update_gather_stats(plugin_name, "gather_errors", 1)
+            except ImportError:
+                pass
+        # Global tags are merged once per series, not copied into every point
+        return metrics_to_send.with_labels(self.tags, self._tagged_ids), logs_to_send
+
+    def _gather_concurrent(self, resolved_inputs):
+        """
+        Run inputs on the worker pool and wait for each one up to its timeout.
+
+        The timeout runs from when a worker starts the gather, so time spent
+        queued behind other plugins does not count against it. A plugin that
+        does not finish in time is abandoned for this cycle and counted in
+        gather_timeouts. It keeps its worker until it returns, and is not
+        scheduled again while it is still running; the pool starts another
+        worker in its place. Workers are daemon threads, so a plugin that
+        never returns cannot block shutdown.
+        """
+        if self._executor is None:
+            self._executor = _DaemonPool(max_workers=self.max_workers, thread_name_prefix="rtcollector-input")
 
-                if len(self.buffered_logs) > self.max_buffer_size:
-                    if self.warn_on_buffer:
-                        print(f"[WARNING] Buffered logs exceeded max buffer size ({self.max_buffer_size}). Dropping oldest entries.")
-                    self.buffered_logs = self.buffered_logs[-self.max_buffer_size:]
+        futures = []
+        for plugin_name, input_handler in resolved_inputs:
+            pending = self._pending_inputs.get(plugin_name)
+            if pending is not None:
+                if not pending.done():
+                    print(f"[{datetime.now().isoformat()}] [Collector] Skipping input plugin '{plugin_name}': previous gather still running")
+                    continue
+                del self._pending_inputs[plugin_name]
+            future = self._executor.submit(self._gather_input, plugin_name, input_handler)
+            futures.append((plugin_name, future))
 
-                all_successful = True
+        results = []
+        for plugin_name, future in futures:
+            timeout = self._input_timeouts.get(plugin_name)
+            remaining = None
+            if timeout:
+                # Gathers start in submission order, and every earlier one has
+                # finished or been abandoned by now, so this one has a worker
+                future.started.wait()
+                remaining = max(0.0, future.started_at + timeout - time.monotonic())
+            try:
+                results.append((plugin_name, *future.result(timeout=remaining)))
+            except FutureTimeoutError:
+                self._executor.abandon(future)
+                self._pending_inputs[plugin_name] = future
+                print(f"[{datetime.now().isoformat()}] [Collector] Input plugin '{plugin_name}' timed out after {self._input_timeouts[plugin_name]}s")
                 try:
-                    for output in self.outputs:
-                        try:
-                            if hasattr(output, "supports_logs") and output.supports_logs:
-                                if self.buffered_logs:
-                                    try:
-                                        output.write(self.buffered_logs)
-                                        print(f"[{datetime.now().isoformat()}] [Collector] Wrote {len(self.buffered_logs)} logs to {output.__class__.__name__}")
-                                    except Exception as e:
-                                        all_successful = False
-                                        print(f"[{datetime.now().isoformat()}] [Collector] Failed to write logs to {output.__class__.__name__}: {e}")
-                            elif hasattr(output, "supports_metrics") and output.supports_metrics:
-                                if self.buffered_metrics:
-                                    start_ns = time.time_ns()
-                                    output.write(self.buffered_metrics)
-                                    write_time_ns = time.time_ns() - start_ns
-                                    print(f"[{datetime.now().isoformat()}] [Collector] Wrote {len(self.buffered_metrics)} metrics to {output.__class__.__name__}")
-                                    
-                                    # Update internal stats
-                                    try:
-                                        from inputs.internal import update_collector_stats, update_write_stats
-                                        update_collector_stats("metrics_written", len(self.buffered_metrics))
-                                        output_name = output.__class__.__name__
-                                        update_write_stats(output_name, "metrics_written", len(self.buffered_metrics))
-                                        update_write_stats(output_name, "write_time_ns", write_time_ns)
-                                        update_write_stats(output_name, "buffer_size", len(self.buffered_metrics))
-                                        update_write_stats(output_name, "buffer_limit", self.max_buffer_size)
-                                    except ImportError:
-                                        pass
-                            else:
-                                if self.buffered_metrics:
-                                    output.write(self.buffered_metrics)
-                                if self.buffered_logs:
-                                    output.write(self.buffered_logs)
-                                print(f"[{datetime.now().isoformat()}] [Collector] Wrote {len(self.buffered_metrics) + len(self.buffered_logs)} metrics to {output.__class__.__name__}")
-                        except Exception as e:
-                            all_successful = False
-                            print(f"[{datetime.now().isoformat()}] [Collector] Error in output plugin: {e}")
-
-                    for output in self.metrics_only_outputs:
-                        try:
-                            if self.buffered_metrics:
-                                output.write(self.buffered_metrics)
-                                print(f"[{datetime.now().isoformat()}] [Collector] Wrote {len(self.buffered_metrics)} metrics to {output.__class__.__name__}")
-                        except Exception as e:
-                            all_successful = False
-                            print(f"[{datetime.now().isoformat()}] [Collector] Error in metrics-only output plugin: {e}")
-
-                    for output in self.logs_only_outputs:
-                        try:
-                            if self.buffered_logs:
-                                output.write(self.buffered_logs)
-                                print(f"[{datetime.now().isoformat()}] [Collector] Wrote {len(self.buffered_logs)} logs to {output.__class__.__name__}")
-                        except Exception as e:
-                            all_successful = False
-                            print(f"[{datetime.now().isoformat()}] [Collector] Error in logs-only output plugin: {e}")
-                except Exception:
-                    all_successful = False
-
-                if all_successful:
-                    self.buffered_metrics.clear()
-                    self.buffered_logs.clear()
-                    self._last_flush_time = now
-
-            print(f"[{datetime.now().isoformat()}] [Collector] Sleeping for {self.interval} seconds...\n")
-            time.sleep(self.interval)
\ No newline at end of file
+                    from inputs.internal import update_collector_stats, update_gather_stats
+                    update_collector_stats("gather_timeouts")
+                    update_gather_stats(plugin_name, "gather_timeouts", 1)
+                except ImportError:
+                    pass
+        return results
+
+    def _buffer(self, metrics_to_send, logs_to_send):
+        """Append gathered data to the collector buffers."""
+        dropped_count = self.buffered_metrics.append(metrics_to_send)
+        if dropped_count and self.spool is None:
+            if self.warn_on_buffer:
+                print(f"[WARNING] Buffered metrics exceeded max buffer size ({self.max_buffer_size}). Dropping oldest entries.")
+            # Update internal stats for dropped metrics
+            try:
+                from inputs.internal import update_collector_stats
+                update_collector_stats("metrics_dropped", dropped_count)
+            except ImportError:
+                pass
+        if isinstance(metrics_to_send, MetricBatch):
+            registry.mark_seen(metrics_to_send.series_ids)
+        if self.series_expiry and time.monotonic() >= self._next_series_expiry:
+            self._expire_series()
+        print(f"[{datetime.now().isoformat()}] [Collector] Buffered {len(self.buffered_metrics)} metrics.")
+        if self.buffered_logs.append(logs_to_send) and self.spool is None and self.warn_on_buffer:
+            print(f"[WARNING] Buffered logs exceeded max buffer size ({self.max_buffer_size}). Dropping oldest entries.")
+        print(f"[{datetime.now().isoformat()}] [Collector] Buffered {len(self.buffered_logs)} logs.")
+        metric_progress = int(self.buffered_metrics.occupancy * 20)
+        log_progress = int(self.buffered_logs.occupancy * 20)
+        metric_bar = f"\033[92m{'#' * metric_progress}\033[90m{'.' * (20 - metric_progress)}\033[0m"
+        log_bar = f"\033[94m{'#' * log_progress}\033[90m{'.' * (20 - log_progress)}\033[0m"
+        print(f"[{datetime.now().isoformat()}] [Collector] Metric buffer: [{metric_bar}] {len(self.buffered_metrics)}/{self.max_buffer_size} (dropped: {self.buffered_metrics.total_dropped})")
+        print(f"[{datetime.now().isoformat()}] [Collector] Log buffer:    [{log_bar}] {len(self.buffered_logs)}/{self.max_buffer_size} (dropped: {self.buffered_logs.total_dropped})")
+
+    def _build_routes(self):
+        """
+        Return the (output, kind, consumer) triples the flush writes to.
+
+        kind is "metrics" or "logs". consumer is a stable name such as
+        "Redistimeseries-metrics" identifying the output's cursor in the
+        matching buffer (and its directory in the spool), so outputs retry
+        independently.
+        """
+        pairs = []
+        for output in self.outputs:
+            supports_metrics = getattr(output, "supports_metrics", False)
+            supports_logs = getattr(output, "supports_logs", False)
+            if supports_metrics or not supports_logs:
+                pairs.append((output, "metrics"))
+            if supports_logs or not supports_metrics:
+                pairs.append((output, "logs"))
+        pairs.extend((output, "metrics") for output in self.metrics_only_outputs)
+        pairs.extend((output, "logs") for output in self.logs_only_outputs)
+
+        routes = []
+        seen = {}
+        for output, kind in pairs:
+            consumer = f"{output.__class__.__name__}-{kind}"
+            seen[consumer] = seen.get(consumer, 0) + 1
+            if seen[consumer] > 1:
+                consumer = f"{consumer}-{seen[consumer]}"
+            self._buffer_for(kind).register(consumer)
+            routes.append((output, kind, consumer))
+
+        # A misspelled output in a route would silently send its series nowhere
+        aliases = {getattr(output, "alias", output.__class__.__name__) for output, kind, consumer in routes}
+        for router in self._routers:
+            unknown = sorted(set().union(*(outputs for matcher, outputs in router.routes)) - aliases)
+            if unknown:
+                raise ValueError(f"{router.__class__.__name__} routes to unknown output(s) {', '.join(unknown)}; configured outputs: {', '.join(sorted(aliases))}")
+        return routes
+
+    def _buffer_for(self, kind):
+        return self.buffered_metrics if kind == "metrics" else self.buffered_logs
+
+    def _spill(self, consumer, entries):
+        """SharedBuffer overflow callback: move what a lagging output would lose to disk."""
+        self.spool.write(consumer, entries)
+        print(f"[{datetime.now().isoformat()}] [Collector] Spooled {len(entries)} entries for {consumer} to disk")
+
+    def _expire_series(self):
+        """Drop series not seen for series_expiry, keeping those still waiting in the metric buffer."""
+        self._next_series_expiry = time.monotonic() + self.series_expiry
+        ring = self.buffered_metrics.ring
+        expired = registry.expire(keep=ring.slice(ring.start, ring.end).series_ids)
+        if expired:
+            print(f"[{datetime.now().isoformat()}] [Collector] Expired {expired} series not seen for {self.series_expiry:g}s ({len(registry)} active)")
+
+    def _routed(self, output, batch):
+        """
+        Return the part of a metric batch routed to the output.
+
+        Outputs are named by their alias (the name in the config unless set
+        explicitly); the decision is cached per output and series id.
+        """
+        alias = getattr(output, "alias", output.__class__.__name__)
+        decisions = self._route_decisions.get(alias)
+        if decisions is None:
+            decisions = self._route_decisions[alias] = registry.cache()
+        batch = MetricBatch.from_metrics(batch)
+        routed = MetricBatch()
+        for series_id, value, timestamp in batch.rows():
+            allowed = decisions.get(series_id)
+            if allowed is None:
+                allowed = decisions[series_id] = all(router.routes_to(series_id, alias) for router in self._routers)
+            if allowed:
+                routed.series_ids.append(series_id)
+                routed.values.append(value)
+                routed.timestamps.append(timestamp)
+        return routed
+
+    def _write_output(self, output, kind, batch):
+        """Write a batch to an output, updating stats. Returns True on success."""
+        output_name = output.__class__.__name__
+        if kind == "metrics" and self._routers:
+            routed = self._routed(output, batch)
+            if len(routed) < len(batch):
+                try:
+                    from inputs.internal import update_write_stats
+                    update_write_stats(output_name, "metrics_filtered", len(batch) - len(routed))
+                except ImportError:
+                    pass
+            if not routed:
+                # Nothing routed here; the batch counts as written
+                return True
+            batch = routed
+        try:
+            start_ns = time.time_ns()
+            output.write(batch)
+            write_time_ns = time.time_ns() - start_ns
+        except Exception as e:
+            print(f"[{datetime.now().isoformat()}] [Collector] Failed to write {kind} to {output_name}: {e}")
+            return False
+        print(f"[{datetime.now().isoformat()}] [Collector] Wrote {len(batch)} {kind} to {output_name}")
+
+        if kind == "metrics":
+            # Update internal stats
+            try:
+                from inputs.internal import update_collector_stats, update_write_stats
+                update_collector_stats("metrics_written", len(batch))
+                update_write_stats(output_name, "metrics_written", len(batch))
+                update_write_stats(output_name, "write_time_ns", write_time_ns)
+                update_write_stats(output_name, "buffer_size", len(batch))
+                update_write_stats(output_name, "buffer_limit", self.max_buffer_size)
+            except ImportError:
+                pass
+        return True
+
+    def _replay(self, output, kind, consumer):
+        """
+        Write the next spooled batch for a caught-up output.
+
+        Replay is throttled to spool.replay_rate entries per second since the
+        previous replay, so catching up after an outage does not swamp the
+        output. Returns False if the write failed.
+        """
+        now = time.monotonic()
+        elapsed = now - self._last_replay.get(consumer, now - self.flush_interval)
+        self._last_replay[consumer] = now
+        batch, position = self.spool.read(consumer, max(1, int(self.spool.replay_rate * elapsed)))
+        if not batch:
+            return True
+        if not self._write_output(output, kind, batch):
+            return False
+        self.spool.commit(consumer, position)
+        print(f"[{datetime.now().isoformat()}] [Collector] Replayed {len(batch)} spooled {kind} to {output.__class__.__name__}")
+        return True
+
+    def _flush(self):
+        """
+        Write each output's pending backlog to it.
+
+        Every output acknowledges only what it wrote successfully, so a
+        failing output retries its own backlog on the next flush without
+        making the healthy ones write the same data again. Once an output
+        has caught up with memory, its spooled backlog is replayed.
+
+        Returns:
+            bool: True when every output is caught up.
+        """
+        all_successful = True
+        for output, kind, consumer in self._routes:
+            buffer = self._buffer_for(kind)
+            caught_up = True
+            # Copy out at most write_batch_size entries at a time rather than the whole backlog
+            while True:
+                batch = buffer.pending(consumer, self.write_batch_size)
+                if not batch:
+                    break
+                if not self._write_output(output, kind, batch):
+                    caught_up = False
+                    break
+                buffer.ack(consumer, len(batch))
+            if not caught_up:
+                all_successful = False
+                continue
+            if self.spool is not None and not self._replay(output, kind, consumer):
+                all_successful = False
+        return all_successful
+
+    def _spill_backlog(self):
+        """Move every output's unwritten backlog to the spool so shutdown loses nothing."""
+        for output, kind, consumer in self._routes:
+            buffer = self._buffer_for(kind)
+            batch = buffer.pending(consumer)
+            if batch:
+                self.spool.write(consumer, batch)
+                buffer.ack(consumer, len(batch))
+                print(f"[{datetime.now().isoformat()}] [Collector] Spooled {len(batch)} unsent {kind} for {consumer} on shutdown")
+        self.spool.close()
+
+    def _next_deadline(self, interval, last_boundary=None):
+        """
+        Return (deadline, boundary) for the next wall-clock multiple of interval.
+
+        The boundary is aligned to wall-clock time so every host fires on the
+        same marks, while the deadline is expressed on the monotonic clock so
+        the wait is immune to clock adjustments. Missed boundaries are skipped
+        rather than replayed.
+        """
+        wall = time.time()
+        boundary = (math.floor(wall / interval) + 1) * interval
+        if last_boundary is not None and boundary <= last_boundary:
+            boundary = last_boundary + interval
+        return time.monotonic() + (boundary - wall), boundary
+
+    def _process(self, metrics, plugin_name, processors=None):
+        """Run metrics through the processors in order."""
+        for processor in self.processors if processors is None else processors:
+            try:
+                metrics = processor.process(metrics, plugin_name)
+            except Exception as e:
+                print(f"[{datetime.now().isoformat()}] [Collector] Processor {processor.__class__.__name__} failed: {e}")
+        return metrics
+
+    def _drain_processors(self):
+        """Collect what processors still hold (e.g. open aggregation windows) on shutdown."""
+        drained = MetricBatch()
+        for i, processor in enumerate(self.processors):
+            flush = getattr(processor, "flush", None)
+            if flush is not None:
+                # What one processor releases still goes through the ones after it
+                drained.extend(self._process(flush(), None, self.processors[i + 1:]))
+        return drained
+
+    def _collect(self, due_inputs):
+        """Gather the due inputs and buffer what they return."""
+        print(f"[{datetime.now().isoformat()}] [Collector] Collecting metrics from {len(due_inputs)} input(s)...")
+        metrics_to_send = MetricBatch()
+        logs_to_send = []
+
+        if self.concurrent_inputs:
+            results = self._gather_concurrent(due_inputs)
+        else:
+            results = [(plugin_name, *self._gather_input(plugin_name, input_handler)) for plugin_name, input_handler in due_inputs]
+        for plugin_name, metrics, logs in results:
+            metrics_to_send.extend(self._process(metrics, plugin_name))
+            logs_to_send.extend(logs)
+
+        if self.background_flush:
+            self._flush_queue.put((metrics_to_send, logs_to_send))
+        else:
+            self._buffer(metrics_to_send, logs_to_send)
+
+    def _flush_loop(self):
+        """
+        Flusher thread body: drain the queue into the buffers and flush them.
+
+        A flush happens on every flush_interval boundary, or as soon as the
+        buffers hold flush_batch_size entries, whichever comes first. While
+        the outputs are failing, the size trigger is suspended and flushes
+        are retried on the collection interval.
+        """
+        next_flush, flush_boundary = self._next_deadline(self.flush_interval)
+        failing = False
+        while True:
+            stopping = self._stop_event.is_set()
+            try:
+                item = self._flush_queue.get(timeout=0 if stopping else max(0.0, next_flush - time.monotonic()))
+                if item is not None:
+                    self._buffer(*item)
+            except queue.Empty:
+                if stopping:
+                    # Queue drained after stop(): final flush and exit
+                    self._flush()
+                    return
+
+            if stopping:
+                continue
+
+            size_reached = (
+                not failing
+                and self.flush_batch_size
+                and len(self.buffered_metrics) + len(self.buffered_logs) >= self.flush_batch_size
+            )
+            if size_reached or time.monotonic() >= next_flush:
+                if self._flush():
+                    failing = False
+                    self._last_flush_time = time.time()
+                    next_flush, flush_boundary = self._next_deadline(self.flush_interval, flush_boundary)
+                else:
+                    failing = True
+                    next_flush, flush_boundary = self._next_deadline(self.interval, flush_boundary)
+
+    def stop(self, timeout=10):
+        """
+        Shut down cleanly: buffer what processors still hold, write out
+        everything still buffered (through the flusher thread when there is
+        one), spool whatever the outputs did not take, close the outputs
+        and write a final checkpoint.
+        """
+        drained = self._drain_processors()
+        if len(drained):
+            if self._flush_thread is not None:
+                self._flush_queue.put((drained, []))
+            else:
+                self._buffer(drained, [])
+        if self._flush_thread is not None:
+            self._stop_event.set()
+            self._flush_queue.put(None)
+            self._flush_thread.join(timeout)
+        else:
+            # Foreground mode: nothing else will write the drained windows
+            self._flush()
+        if self._executor is not None:
+            # Do not wait for gathers still running (a hung plugin would never return)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.spool is not None:
+            self._spill_backlog()
+        # Outputs with background work (e.g. RedisSearch compaction) stop it here
+        closed = set()
+        for output, kind, consumer in self._routes:
+            close = getattr(output, "close", None)
+            if callable(close) and id(output) not in closed:
+                closed.add(id(output))
+                try:
+                    close()
+                except Exception as e:
+                    print(f"[{datetime.now().isoformat()}] [Collector] Error closing {output.__class__.__name__}: {e}")
+        if self.checkpoint is not None:
+            self.checkpoint.save()
+
+    def run(self):
+        resolved_inputs = [self._resolve_input(input_entry) for input_entry in self.inputs]
+        # Every input runs once at startup, then on its own aligned schedule
+        start = time.monotonic()
+        next_runs = {plugin_name: (start, None) for plugin_name, _ in resolved_inputs}
+        next_flush, flush_boundary = self._next_deadline(self.flush_interval)
+        if self.background_flush:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="rtcollector-flusher", daemon=True)
+            self._flush_thread.start()
+
+        while True:
+            now = time.monotonic()
+            due_inputs = []
+            for plugin_name, input_handler in resolved_inputs:
+                deadline, boundary = next_runs[plugin_name]
+                if deadline <= now:
+                    due_inputs.append((plugin_name, input_handler))
+                    next_runs[plugin_name] = self._next_deadline(self._input_intervals[plugin_name], boundary)
+
+            if due_inputs:
+                self._collect(due_inputs)
+
+            if not self.background_flush and time.monotonic() >= next_flush:
+                if self._flush():
+                    self._last_flush_time = time.time()
+                    next_flush, flush_boundary = self._next_deadline(self.flush_interval, flush_boundary)
+                else:
+                    # Retry on the base collection interval until the outputs recover
+                    next_flush, flush_boundary = self._next_deadline(self.interval, flush_boundary)
+
+            if self.checkpoint is not None:
+                self.checkpoint.maybe_save()
+
+            wake_times = [deadline for deadline, _ in next_runs.values()]
+            if not self.background_flush:
+                wake_times.append(next_flush)
+            wake_at = min(wake_times)
+            sleep_for = max(0.0, wake_at - time.monotonic())
+            print(f"[{datetime.now().isoformat()}] [Collector] Sleeping for {sleep_for:.2f} seconds...\n")
+            time.sleep(sleep_for)
@@ -0,0 +1,72 @@
+# core/labels.py
+import threading
+
+
+class LabelSet(dict):
+    """
+    Immutable, hashable set of labels.
+
+    A LabelSet reads like a normal dict (items(), get(), copy(), ** unpacking,
+    json.dumps) but refuses mutation, and hashes by content with the hash
+    computed once. Use LabelSet.intern() to get the shared instance for a
+    given set of labels, so identical labels across metrics and series are
+    stored once and compare by identity.
+    """
+    __slots__ = ("_hash", "_canonical")
+
+    _interned = {}
+    _lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._hash = hash(_content_key(self))
+        self._canonical = False
+
+    def __hash__(self):
+        return self._hash
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("LabelSet is immutable; use merge() to derive a new one")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (LabelSet, (dict(self),))
+
+    @classmethod
+    def intern(cls, labels):
+        """Return the shared LabelSet holding exactly these labels."""
+        if isinstance(labels, LabelSet) and labels._canonical:
+            return labels
+        key = _content_key(labels or {})
+        label_set = cls._interned.get(key)
+        if label_set is None:
+            with cls._lock:
+                label_set = cls._interned.get(key)
+                if label_set is None:
+                    label_set = cls(labels or {})
+                    label_set._canonical = True
+                    cls._interned[key] = label_set
+        return label_set
+
+    @classmethod
+    def prune(cls, in_use):
+        """Forget interned label sets whose id() is not in in_use."""
+        with cls._lock:
+            for key in [key for key, label_set in cls._interned.items() if id(label_set) not in in_use]:
+                del cls._interned[key]
+
+    def merge(self, extra):
+        """Return the interned LabelSet of these labels overlaid with extra."""
+        if not extra:
+            return LabelSet.intern(self)
+        return LabelSet.intern({**self, **extra})
+
+
+def _content_key(labels):
+    try:
+        return frozenset(labels.items())
+    except TypeError:
+        # Unhashable label values (e.g. lists) are keyed by their string form
+        return frozenset((k, str(v)) for k, v in labels.items())
@@ -1,10 +1,12 @@
-
-
+from array import array
 from dataclasses import dataclass
 from typing import Dict
+from core.series import registry
 
 @dataclass
 class Metric:
+    # Slotted: no per-instance __dict__ for the thousands of points gathered each cycle
+    __slots__ = ("name", "value", "timestamp", "labels")
     name: str
     value: float
     timestamp: int
@@ -17,4 +19,89 @@ class Metric:
         label_parts = []
         for k, v in self.labels.items():
             label_parts.extend([k, v])
-        return [self.name, self.timestamp, self.value, "LABELS", *label_parts]
\ No newline at end of file
+        return [self.name, self.timestamp, self.value, "LABELS", *label_parts]
+
+
+def intern_series(name, labels):
+    """Return the registry id of the series (name, labels)."""
+    return registry.intern(name, labels)
+
+
+class MetricBatch:
+    """
+    Columnar batch of metric points.
+
+    Each point is a series id (see core.series.registry), a float value and an
+    integer millisecond timestamp, stored in three parallel arrays instead
+    of one Metric object per point. Iterating a batch yields Metric objects
+    for code that still works point by point.
+    """
+    __slots__ = ("series_ids", "values", "timestamps")
+
+    def __init__(self, series_ids=None, values=None, timestamps=None):
+        self.series_ids = series_ids if series_ids is not None else array("q")
+        self.values = values if values is not None else array("d")
+        self.timestamps = timestamps if timestamps is not None else array("q")
+
+    @classmethod
+    def from_metrics(cls, metrics):
+        """Build a batch from Metric objects (or return a MetricBatch unchanged)."""
+        if isinstance(metrics, MetricBatch):
+            return metrics
+        batch = cls()
+        for m in metrics:
+            batch.add(m)
+        return batch
+
+    def append(self, name, value, timestamp, labels):
+        """Add one point without creating a Metric object."""
+        self.series_ids.append(intern_series(name, labels))
+        self.values.append(float(value))
+        self.timestamps.append(int(timestamp))
+
+    def add(self, metric):
+        self.append(metric.name, metric.value, metric.timestamp, metric.labels)
+
+    def extend(self, other):
+        """Append another MetricBatch, or an iterable of Metric objects."""
+        if isinstance(other, MetricBatch):
+            self.series_ids.extend(other.series_ids)
+            self.values.extend(other.values)
+            self.timestamps.extend(other.timestamps)
+        else:
+            for m in other:
+                self.add(m)
+
+    def with_labels(self, extra, mapping=None):
+        """
+        Return a batch whose series carry the extra labels as well.
+
+        Labels are merged once per series; pass a persistent mapping dict to
+        reuse merged ids across batches. Values and timestamps are shared
+        with this batch, not copied.
+        """
+        if not extra:
+            return self
+        if mapping is None:
+            mapping = {}
+        merge = registry.with_labels
+        series_ids = array("q", [merge(series_id, extra, mapping) for series_id in self.series_ids])
+        return MetricBatch(series_ids, self.values, self.timestamps)
+
+    def rows(self):
+        """Iterate (series_id, value, timestamp) tuples."""
+        return zip(self.series_ids, self.values, self.timestamps)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        for series_id, value, timestamp in self.rows():
+            name, labels = registry.info(series_id)
+            yield Metric(name=name, value=value, timestamp=timestamp, labels=labels)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MetricBatch(self.series_ids[index], self.values[index], self.timestamps[index])
+        name, labels = registry.info(self.series_ids[index])
+        return Metric(name=name, value=self.values[index], timestamp=self.timestamps[index], labels=labels)
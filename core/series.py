@@ -0,0 +1,168 @@
+# core/series.py
+import threading
+from core.labels import LabelSet
+
+
+class SeriesRegistry:
+    """
+    Process-wide registry interning (name, labels) pairs to small integer ids.
+
+    Interning costs one hash of the label items; everything derived from a
+    series (its canonical key, its flattened label arguments, per-output
+    command arguments) is computed once per id and cached, so hot paths
+    work with ids instead of re-sorting and re-serializing labels for every
+    point.
+
+    Series that stop appearing (e.g. containers that are gone) are dropped
+    by expire(), together with everything cached for them; ids are never
+    reused, so a stale id can only miss, never alias another series.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._ids = {}
+        self._next_id = 0
+        self._keys = {}
+        self._label_args = {}
+        self._caches = {}
+        self._anonymous_caches = []
+        # series_id -> generation in which it was last interned or marked seen
+        self._seen = {}
+        self._generation = 0
+        # Ids unlinked by the last expire(), still readable until the next one
+        self._retiring = set()
+        self._lock = threading.Lock()
+
+    def intern(self, name, labels):
+        """Return the id of the series (name, labels), registering it on first use."""
+        # Interned label sets hash once and compare by identity
+        key = (name, LabelSet.intern(labels))
+        series_id = self._ids.get(key)
+        if series_id is None:
+            with self._lock:
+                series_id = self._ids.get(key)
+                if series_id is None:
+                    series_id = self._next_id
+                    self._next_id += 1
+                    self._series[series_id] = key
+                    self._ids[key] = series_id
+        self._seen[series_id] = self._generation
+        return series_id
+
+    def mark_seen(self, series_ids):
+        """Keep series that are still in use but no longer interned (derived or buffered ids) alive."""
+        self._seen.update(dict.fromkeys(series_ids, self._generation))
+
+    def expire(self, keep=()):
+        """
+        Drop series not interned or marked seen since the previous call.
+
+        Called once per expiry period, in two steps. Series unseen for at
+        least one full period are unlinked, so interning them again yields a
+        new id. Other threads intern without taking the lock and may just
+        have been handed such an id, so an unlinked series stays readable
+        until the next call. Only then is it removed, with its entries in
+        every cache handed out by cache(). Ids in keep (e.g. still buffered)
+        are retained. Label sets no longer used by any series are released
+        as well.
+
+        Returns:
+            int: Number of series dropped
+        """
+        with self._lock:
+            cutoff = self._generation - 1
+            keep = set(keep)
+            expired = [series_id for series_id in self._retiring if series_id not in keep]
+            self._retiring.difference_update(expired)
+            for series_id in expired:
+                self._seen.pop(series_id, None)
+                self._series.pop(series_id, None)
+                self._keys.pop(series_id, None)
+                self._label_args.pop(series_id, None)
+            if expired:
+                for cache in (*self._caches.values(), *self._anonymous_caches):
+                    for series_id in expired:
+                        cache.pop(series_id, None)
+                LabelSet.prune({id(labels) for _, labels in list(self._series.values())})
+
+            # Snapshot: other threads intern (and mark) without taking the lock
+            for series_id, generation in list(self._seen.items()):
+                if generation < cutoff and series_id not in keep and series_id not in self._retiring:
+                    key = self._series.get(series_id)
+                    if key is not None and self._ids.get(key) == series_id:
+                        del self._ids[key]
+                    self._retiring.add(series_id)
+            self._generation += 1
+        return len(expired)
+
+    def with_labels(self, series_id, extra, mapping):
+        """
+        Return the id of the series with extra labels overlaid.
+
+        mapping is the caller's dict from source id to merged id, so each
+        series is merged once rather than once per point.
+        """
+        merged_id = mapping.get(series_id)
+        if merged_id is None or merged_id not in self:
+            name, labels = self._series[series_id]
+            merged_id = mapping[series_id] = self.intern(name, labels.merge(extra))
+        return merged_id
+
+    def info(self, series_id):
+        """Return the (name, labels) pair of a series; labels is a shared LabelSet."""
+        return self._series[series_id]
+
+    def name(self, series_id):
+        return self._series[series_id][0]
+
+    def labels(self, series_id):
+        return self._series[series_id][1]
+
+    def key(self, series_id):
+        """Return the canonical "name:k1=v1,k2=v2" key of a series, labels sorted."""
+        key = self._keys.get(series_id)
+        if key is None:
+            name, labels = self._series[series_id]
+            if labels:
+                key = f"{name}:" + ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+            else:
+                key = name
+            self._keys[series_id] = key
+        return key
+
+    def label_args(self, series_id):
+        """Return the labels flattened to [k1, v1, k2, v2, ...] with string values."""
+        args = self._label_args.get(series_id)
+        if args is None:
+            args = []
+            for k, v in self._series[series_id][1].items():
+                args.extend([k, str(v)])
+            self._label_args[series_id] = args
+        return args
+
+    def cache(self, namespace=None):
+        """
+        Return a dict for data a component derives per series id.
+
+        Outputs use this to keep their own serialized arguments (which may
+        depend on their configuration) next to the registry; processors and
+        the collector keep per-series decisions in unnamed ones. Entries of
+        expired series are removed from every cache.
+        """
+        with self._lock:
+            if namespace is None:
+                cache = {}
+                self._anonymous_caches.append(cache)
+                return cache
+            return self._caches.setdefault(namespace, {})
+
+    def __contains__(self, series_id):
+        """Return True if the id is live: registered and not being expired."""
+        return series_id in self._series and series_id not in self._retiring
+
+    def __len__(self):
+        return len(self._series)
+
+
+# Shared by every plugin and output in the process
+registry = SeriesRegistry()
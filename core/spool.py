@@ -0,0 +1,210 @@
+# core/spool.py
+import json
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime
+from core.metric import Metric
+
+# Record header: payload length and CRC32 of the payload
+_HEADER = struct.Struct("<II")
+
+_SIZE_UNITS = {"KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3, "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3}
+
+
+def parse_size(value):
+    """Convert a size such as 512MiB, 64KiB or a plain number of bytes to bytes."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().upper()
+    for unit, factor in _SIZE_UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def _encode(entries):
+    """Serialize metrics and log dicts into a JSON record payload."""
+    items = []
+    for entry in entries:
+        if isinstance(entry, Metric):
+            items.append([entry.name, entry.value, entry.timestamp, dict(entry.labels)])
+        else:
+            items.append(entry)
+    return json.dumps(items, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(payload):
+    entries = []
+    for item in json.loads(payload):
+        if isinstance(item, list):
+            entries.append(Metric(name=item[0], value=item[1], timestamp=item[2], labels=item[3]))
+        else:
+            entries.append(item)
+    return entries
+
+
+def _timestamp(entry):
+    if isinstance(entry, Metric):
+        return entry.timestamp
+    return entry.get("timestamp", 0) if isinstance(entry, dict) else 0
+
+
+class DiskSpool:
+    """
+    Append-only, size-capped segment files holding data outputs could not take.
+
+    Every consumer (one output and data kind) gets its own directory of
+    numbered segment files. Records are length-prefixed and CRC32-checked
+    batches of entries; a torn or corrupt record ends the segment on replay.
+    The read position is kept in an offset file, so replay resumes where it
+    stopped after a restart. When a consumer's directory grows beyond
+    max_size, its oldest segments are deleted.
+    """
+
+    def __init__(self, path, max_size="256MiB", segment_size="8MiB", replay_rate=1000):
+        self.path = path
+        self.max_size = parse_size(max_size)
+        self.segment_size = parse_size(segment_size)
+        self.replay_rate = replay_rate
+        self._lock = threading.Lock()
+        self._writers = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def _dir(self, consumer):
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in consumer)
+        path = os.path.join(self.path, safe)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _segments(self, consumer):
+        """Return the consumer's segment sequence numbers, oldest first."""
+        path = self._dir(consumer)
+        return sorted(int(name[:-4]) for name in os.listdir(path) if name.endswith(".seg"))
+
+    def _segment_path(self, consumer, seq):
+        return os.path.join(self._dir(consumer), f"{seq:020d}.seg")
+
+    def _read_offset(self, consumer):
+        try:
+            with open(os.path.join(self._dir(consumer), "offset"), "r") as f:
+                seq, pos = f.read().split()
+                return int(seq), int(pos)
+        except (OSError, ValueError):
+            return None, 0
+
+    def _write_offset(self, consumer, seq, pos):
+        path = os.path.join(self._dir(consumer), "offset")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{seq} {pos}")
+        os.replace(tmp, path)
+
+    def write(self, consumer, entries):
+        """Append a batch of entries for a consumer."""
+        if not entries:
+            return
+        payload = _encode(entries)
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            writer = self._writers.get(consumer)
+            if writer is None or writer.tell() >= self.segment_size:
+                if writer is not None:
+                    writer.close()
+                segments = self._segments(consumer)
+                seq = segments[-1] + 1 if segments else 0
+                writer = open(self._segment_path(consumer, seq), "ab")
+                self._writers[consumer] = writer
+            writer.write(record)
+            writer.flush()
+            self._enforce_cap(consumer)
+
+    def _enforce_cap(self, consumer):
+        """Delete the consumer's oldest closed segments while it is over max_size."""
+        segments = self._segments(consumer)
+        sizes = {seq: os.path.getsize(self._segment_path(consumer, seq)) for seq in segments}
+        total = sum(sizes.values())
+        for seq in segments[:-1]:
+            if total <= self.max_size:
+                break
+            os.remove(self._segment_path(consumer, seq))
+            total -= sizes[seq]
+            print(f"[{datetime.now().isoformat()}] [Spool] Size cap reached for {consumer}, dropped segment {seq} ({sizes[seq]} bytes)")
+
+    def read(self, consumer, max_entries):
+        """
+        Read the oldest spooled entries for a consumer, sorted by timestamp.
+
+        At least one record is returned when data is available, even if it
+        holds more than max_entries entries.
+
+        Returns:
+            tuple: (entries, position) where position is passed to commit()
+            once the entries have been written.
+        """
+        with self._lock:
+            segments = self._segments(consumer)
+            offset_seq, offset_pos = self._read_offset(consumer)
+            entries = []
+            position = None
+            for seq in segments:
+                if offset_seq is not None and seq < offset_seq:
+                    continue
+                pos = offset_pos if seq == offset_seq else 0
+                with open(self._segment_path(consumer, seq), "rb") as f:
+                    f.seek(pos)
+                    while len(entries) < max_entries or not entries:
+                        header = f.read(_HEADER.size)
+                        if len(header) < _HEADER.size:
+                            break
+                        length, crc = _HEADER.unpack(header)
+                        payload = f.read(length)
+                        if len(payload) < length or zlib.crc32(payload) != crc:
+                            print(f"[{datetime.now().isoformat()}] [Spool] Corrupt record in {consumer} segment {seq} at byte {pos}, skipping rest of segment")
+                            pos = os.path.getsize(self._segment_path(consumer, seq))
+                            break
+                        entries.extend(_decode(payload))
+                        pos = f.tell()
+                position = (seq, pos)
+                if len(entries) >= max_entries:
+                    break
+            entries.sort(key=_timestamp)
+            return entries, position
+
+    def commit(self, consumer, position):
+        """Record that everything up to position was written and drop finished segments."""
+        if position is None:
+            return
+        seq, pos = position
+        with self._lock:
+            writer = self._writers.get(consumer)
+            for old in self._segments(consumer):
+                if old >= seq:
+                    break
+                os.remove(self._segment_path(consumer, old))
+            path = self._segment_path(consumer, seq)
+            if not os.path.exists(path):
+                # Evicted by the size cap while it was being replayed
+                self._write_offset(consumer, seq + 1, 0)
+                return
+            active = writer is not None and writer.name == path
+            if not active and pos >= os.path.getsize(path):
+                os.remove(path)
+                self._write_offset(consumer, seq + 1, 0)
+            else:
+                self._write_offset(consumer, seq, pos)
+
+    def sync(self):
+        """Flush and fsync every open segment."""
+        with self._lock:
+            for writer in self._writers.values():
+                writer.flush()
+                os.fsync(writer.fileno())
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
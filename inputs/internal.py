@@ -15,11 +15,14 @@ collector_stats = {
     "metrics_dropped": 0,
     "gather_errors": 0,
     "gather_timeouts": 0,
+    "metrics_suppressed": 0,
+    "metrics_filtered": 0,
 }
 
 # Plugin-specific stats dictionaries
 gather_stats = {}  # Format: {"plugin_name": {"gather_time_ns": 0, "metrics_gathered": 0}}
 write_stats = {}   # Format: {"plugin_name": {"write_time_ns": 0, "metrics_written": 0, "metrics_dropped": 0}}
+cardinality_stats = {}  # Format: {"plugin_name": {"series_admitted": 0, "series_rejected": 0, "metrics_rejected": 0, "series_limit": 0}}
 
 # Lock for thread-safe updates
 stats_lock = threading.Lock()
@@ -36,6 +39,7 @@ def update_gather_stats(plugin_name, field, value):
             gather_stats[plugin_name] = {
                 "gather_time_ns": 0,
                 "metrics_gathered": 0,
+                "gather_errors": 0,
                 "gather_timeouts": 0
             }
         gather_stats[plugin_name][field] += value
@@ -54,6 +58,18 @@ def update_write_stats(plugin_name, field, value):
             }
         write_stats[plugin_name][field] += value
 
+def set_cardinality_stats(plugin_name, **values):
+    """Set the current cardinality limiter figures for an input plugin"""
+    with stats_lock:
+        if plugin_name not in cardinality_stats:
+            cardinality_stats[plugin_name] = {
+                "series_admitted": 0,
+                "series_rejected": 0,
+                "metrics_rejected": 0,
+                "series_limit": 0
+            }
+        cardinality_stats[plugin_name].update(values)
+
 def collect(config=None):
     """Collect internal metrics about the collector and its plugins"""
     timestamp = int(time.time() * 1000)
@@ -90,7 +106,7 @@ def collect(config=None):
         ))
         
         # Calculate and add rate metrics for counter values
-        if name in ["metrics_gathered", "metrics_written", "metrics_dropped", "gather_errors"]:
+        if name in ["metrics_gathered", "metrics_written", "metrics_dropped", "gather_errors", "metrics_suppressed", "metrics_filtered"]:
             metric_key = f"internal_agent_{name}"
             rate = calculate_rate(metric_key, value, timestamp)
             if rate is not None:
@@ -147,6 +163,16 @@ def collect(config=None):
                         labels={"host": hostname, "output": plugin_name}
                     ))
     
+    # Add cardinality limiter stats for each input plugin
+    for plugin_name, stats in list(cardinality_stats.items()):
+        for name, value in stats.items():
+            metrics.append(Metric(
+                name=f"internal_cardinality_{name}",
+                value=value,
+                timestamp=timestamp,
+                labels={"host": hostname, "input": plugin_name}
+            ))
+    
     # Add process stats
     metrics.append(Metric(
         name="internal_process_cpu_seconds_total",
@@ -1,8 +1,10 @@
 import time
 import socket
 import platform
-from core.metric import Metric
+from core.checkpoint import register_state
+from core.metric import MetricBatch
 from utils.debug import debug_log
+from utils.metrics import canonical_schema
 
 _last_cpu_times = {}
 
@@ -10,11 +12,13 @@ def collect(config=None):
     # Verify we're on Linux
     if platform.system() != "Linux":
         print("[linux_cpu] This plugin only works on Linux")
-        return []
+        return MetricBatch()
     
-    metrics = []
+    # Columnar batch: one series id, value and timestamp per point, no Metric objects
+    metrics = MetricBatch()
     timestamp = int(time.time() * 1000)
     hostname = socket.gethostname()
+    canonical = canonical_schema(config)
     
     # Debug logging removed for brevity
     
@@ -34,20 +38,19 @@ def collect(config=None):
             
             fields = _calculate_fields(_last_cpu_times[cpu_id], current[cpu_id])
             core_label = "cpu-total" if cpu_id == "cpu" else cpu_id
+            labels = {"source": "linux_cpu", "core": core_label, "host": hostname, "metric_type": "cpu", "unit": "percent"}
             
             for k, v in fields.items():
                 # Use consistent naming convention with cpu_usage_ prefix
                 base_metric_name = f"cpu_usage_{k}"
                 
-                # Create a unique key for each core by including the core in the name
-                metric_name = f"{base_metric_name}_{core_label}"
+                if canonical:
+                    metric_name = base_metric_name
+                else:
+                    # Create a unique key for each core by including the core in the name
+                    metric_name = f"{base_metric_name}_{core_label}"
                 
-                metrics.append(Metric(
-                    name=metric_name,
-                    value=v,
-                    timestamp=timestamp,
-                    labels={"source": "linux_cpu", "core": core_label, "host": hostname, "metric_type": "cpu", "unit": "percent"}
-                ))
+                metrics.append(metric_name, v, timestamp, labels)
                 # Only log detailed metrics in debug mode
         
         _last_cpu_times = current
@@ -96,4 +99,14 @@ def _calculate_fields(prev, curr):
     fields["active"] = 100.0 * active / total
     fields["idle"] = 100.0 * diffs[3] / total
     
-    return fields
\ No newline at end of file
+    return fields
+
+
+def _save_state():
+    return _last_cpu_times
+
+def _restore_state(state):
+    global _last_cpu_times
+    _last_cpu_times = state
+
+register_state("linux_cpu", _save_state, _restore_state, volatile=True)
@@ -3,7 +3,7 @@ import time
 import socket
 import platform
 from core.metric import Metric
-from utils.metrics import calculate_rate, create_key
+from utils.metrics import calculate_rate, canonical_schema, create_key
 from utils.debug import debug_log
 
 def collect(config=None):
@@ -29,6 +29,7 @@ def collect(config=None):
     logs = []
     timestamp = int(time.time() * 1000)
     hostname = socket.gethostname()
+    canonical = canonical_schema(config)
     
     try:
         # Get mount points to monitor
@@ -49,6 +50,15 @@ def collect(config=None):
             if not mount_key and mount == "/":
                 mount_key = "root"  # For root directory
                 
+            if canonical:
+                metrics.append(Metric(
+                    name="disk_mountpoint",
+                    value=1,
+                    timestamp=timestamp,
+                    labels={"source": "linux_disk", "mount": "root" if mount == "/" else mount, "host": hostname}
+                ))
+                continue
+
             metrics.append(Metric(
                 name=f"disk_mountpoint_{mount_key}",
                 value=1,  # Just a placeholder value
@@ -87,6 +97,21 @@ def collect(config=None):
                 # Common labels - use "root" instead of "/" for the root mount point
                 labels = {"source": "linux_disk", "mount": "root" if mount == "/" else mount, "host": hostname}
                 
+                if canonical:
+                    # Each measurement once, the mount point only in the labels
+                    metrics.extend([
+                        Metric(name="disk_total", value=total, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_used", value=used, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_free", value=free, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_available", value=available, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_used_percent", value=used_percent, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_inodes_total", value=inodes_total, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_inodes_used", value=inodes_used, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_inodes_free", value=inodes_free, timestamp=timestamp, labels=labels),
+                        Metric(name="disk_inodes_percent", value=inodes_percent, timestamp=timestamp, labels=labels),
+                    ])
+                    continue
+
                 # Add disk space metrics with unique keys per mount point to avoid conflicts
                 # Use mount-specific keys for all metrics to prevent duplicate policy issues
                 mount_key = mount.replace('/', '_').strip('_')
@@ -146,6 +171,10 @@ def collect(config=None):
             "tags": {"source": "linux_disk"}
         })
     
+    if canonical:
+        # Names repeat across mount points by design; labels keep the series apart
+        return metrics, logs
+
     # Convert metrics to standard format
     standard_metrics = []
     seen_keys = set()  # Track metric names to avoid duplicates
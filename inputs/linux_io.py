@@ -1,8 +1,9 @@
 import socket
 import time
 import platform
+from core.checkpoint import register_state
 from core.metric import Metric
-from utils.metrics import calculate_rate, create_key
+from utils.metrics import calculate_rate, canonical_schema, create_key
 from utils.debug import debug_log
 
 # Store previous stats for delta calculations
@@ -54,6 +55,7 @@ def collect(config=None):
     logs = []
     timestamp = int(time.time() * 1000)
     hostname = socket.gethostname()
+    canonical = canonical_schema(config)
     
     # Create discovery metrics for all disk devices
     try:
@@ -69,7 +71,7 @@ def collect(config=None):
                 
             # Add discovery metric for this device
             metrics.append(Metric(
-                name=f"diskio_device_{dev}",
+                name="io_device" if canonical else f"diskio_device_{dev}",
                 value=1,  # Just a placeholder value
                 timestamp=timestamp,
                 labels={"host": hostname, "device": dev}
@@ -154,6 +156,25 @@ def collect(config=None):
             
             # Debug logging for calculated values - removed for brevity
             
+            if canonical:
+                # Each measurement once, the device only in the labels
+                metrics.extend([
+                    Metric(name="io_reads", value=delta_reads, timestamp=timestamp, labels=labels),
+                    Metric(name="io_writes", value=delta_writes, timestamp=timestamp, labels=labels),
+                    Metric(name="io_read_bytes", value=read_bytes, timestamp=timestamp, labels=labels),
+                    Metric(name="io_write_bytes", value=write_bytes, timestamp=timestamp, labels=labels),
+                    Metric(name="io_reads_per_sec", value=reads_per_sec, timestamp=timestamp, labels=labels),
+                    Metric(name="io_writes_per_sec", value=writes_per_sec, timestamp=timestamp, labels=labels),
+                    Metric(name="io_read_bytes_per_sec", value=read_bytes_per_sec, timestamp=timestamp, labels=labels),
+                    Metric(name="io_write_bytes_per_sec", value=write_bytes_per_sec, timestamp=timestamp, labels=labels),
+                    Metric(name="io_read_time_ms", value=delta_read_time, timestamp=timestamp, labels=labels),
+                    Metric(name="io_write_time_ms", value=delta_write_time, timestamp=timestamp, labels=labels),
+                    Metric(name="io_read_time_rate", value=read_time_rate, timestamp=timestamp, labels=labels),
+                    Metric(name="io_write_time_rate", value=write_time_rate, timestamp=timestamp, labels=labels),
+                    Metric(name="io_util_percent", value=io_util_percent, timestamp=timestamp, labels=labels),
+                ])
+                continue
+
             # Add metrics
             metrics.extend([
                 # Raw counters with device in name to avoid duplicate policy issues
@@ -235,4 +256,15 @@ def _read_diskstats(config=None):
                 }
     except Exception as e:
         print(f"[linux_io] Error reading /proc/diskstats: {e}")  # Keep this as regular print for errors
-    return stats
\ No newline at end of file
+    return stats
+
+
+def _save_state():
+    return {"stats": _last_stats, "time": _last_time}
+
+def _restore_state(state):
+    global _last_stats, _last_time
+    _last_stats = state["stats"]
+    _last_time = state["time"]
+
+register_state("linux_io", _save_state, _restore_state, volatile=True)
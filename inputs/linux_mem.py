@@ -3,6 +3,7 @@ import socket
 import platform
 from core.metric import Metric
 from utils.debug import debug_log
+from utils.metrics import canonical_schema
 
 def collect(config=None):
     # Verify we're on Linux
@@ -58,8 +59,8 @@ def collect(config=None):
         swap_used = swap_total - swap_free
         swap_percent = (swap_used / swap_total) * 100 if swap_total > 0 else 0
         
-        # Add swap metrics
-        if swap_total > 0:
+        # Add swap metrics; in the canonical schema only linux_swap reports swap
+        if swap_total > 0 and not canonical_schema(config):
             metrics.extend([
                 Metric(name="swap_total", value=swap_total, timestamp=timestamp, labels=labels),
                 Metric(name="swap_used", value=swap_used, timestamp=timestamp, labels=labels),
@@ -1,8 +1,9 @@
 import time
 import socket
 import os
+from core.labels import LabelSet
 from core.metric import Metric
-from utils.metrics import calculate_rate, create_key
+from utils.metrics import calculate_rate, canonical_schema, create_key
 from utils.debug import debug_log
 
 def _read_netdev():
@@ -112,6 +113,9 @@ def collect(config=None):
     current = _read_netdev()
     metrics = []
 
+    if canonical_schema(config):
+        return _collect_canonical(config, current, timestamp, hostname)
+
     # Get list of interfaces (including those that might not have traffic yet)
     interfaces = _get_interfaces(config)
     
@@ -127,7 +131,7 @@ def collect(config=None):
         
         # Also create empty rate metrics for interfaces with no traffic yet
         if iface not in current:
-            labels = {"iface": iface, "host": hostname}
+            labels = LabelSet.intern({"iface": iface, "host": hostname})
             # Create basic rate metrics with zero values
             metrics.append(Metric(
                 name=f"net_rx_bytes_rate_{iface}",
@@ -156,7 +160,7 @@ def collect(config=None):
     
     # Process network traffic metrics
     for iface, vals in current.items():
-        labels = {"iface": iface, "host": hostname}
+        labels = LabelSet.intern({"iface": iface, "host": hostname})
         
         # Process each metric type
         for metric_type in ["rx_bytes", "tx_bytes", "rx_packets", "tx_packets", 
@@ -214,4 +218,31 @@ def collect(config=None):
                     ))
     
     # Debug logging removed for brevity
-    return metrics
\ No newline at end of file
+    return metrics
+
+def _collect_canonical(config, current, timestamp, hostname):
+    """Emit each interface measurement once, with the interface in the iface label."""
+    metrics = []
+
+    for iface in _get_interfaces(config):
+        labels = LabelSet.intern({"iface": iface, "host": hostname})
+        metrics.append(Metric(name="net_interface", value=1, timestamp=timestamp, labels=labels))
+        # Interfaces without traffic yet still get their rate series
+        if iface not in current:
+            metrics.append(Metric(name="net_rx_bytes_rate", value=0, timestamp=timestamp, labels=labels))
+            metrics.append(Metric(name="net_tx_bytes_rate", value=0, timestamp=timestamp, labels=labels))
+
+    for iface, vals in current.items():
+        labels = LabelSet.intern({"iface": iface, "host": hostname})
+        for metric_type in ["rx_bytes", "tx_bytes", "rx_packets", "tx_packets",
+                            "rx_errs", "tx_errs", "rx_drop", "tx_drop"]:
+            value = vals[metric_type]
+            metric_name = f"net_{metric_type}"
+            metrics.append(Metric(name=metric_name, value=value, timestamp=timestamp, labels=labels))
+
+            # Same rate key as the legacy schema, so switching keeps the baselines
+            rate = calculate_rate(create_key(f"{metric_name}_{iface}", labels), value, timestamp)
+            if rate is not None:
+                metrics.append(Metric(name=f"{metric_name}_rate", value=rate, timestamp=timestamp, labels=labels))
+
+    return metrics
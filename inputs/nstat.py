@@ -1,6 +1,7 @@
 import time
 import socket
 import os
+from core.labels import LabelSet
 from core.metric import Metric
 from utils.metrics import calculate_rate, create_key
 from utils.debug import debug_log
@@ -9,6 +10,8 @@ def collect(config=None):
     """Collect network statistics from /proc/net/snmp."""
     timestamp = int(time.time() * 1000)
     hostname = socket.gethostname()
+    # One shared label set for every nstat series
+    labels = LabelSet.intern({"host": hostname})
     metrics = []
     
     try:
@@ -38,7 +41,6 @@ def collect(config=None):
                             
                             # Create the full metric name
                             full_metric_name = f"nstat_{protocol}_{metric_name}"
-                            labels = {"host": hostname}
                             
                             # Add raw counter metric
                             metrics.append(Metric(
@@ -76,7 +78,6 @@ def collect(config=None):
                                 
                                 # Create the full metric name
                                 full_metric_name = f"nstat_ip6_{metric_name}"
-                                labels = {"host": hostname}
                                 
                                 # Add raw counter metric
                                 metrics.append(Metric(
@@ -1,5 +1,5 @@
 from core.metric import Metric
-import redis
+from utils.redis_conn import CONNECTION_ERRORS, get_connection
 import time
 
 def collect(config) -> tuple:
@@ -27,30 +27,22 @@ def collect(config) -> tuple:
         print("[redis] Error: Missing required configuration. Please check config.yml for host and port settings.")
         return [], []
 
+    # Shared connection, kept across collections; reconnects with backoff after Redis goes away
+    connection = get_connection(
+        "redis", host=host, port=port, db=db, username=username, password=password,
+        ssl=ssl, ssl_ca_certs=ssl_ca_certs, ssl_certfile=ssl_certfile, ssl_keyfile=ssl_keyfile,
+        **(redis_config.get("reconnect") or {})
+    )
+    r = connection.client()
+    if r is None:
+        return [], []
     try:
-        # Configure SSL if enabled
-        ssl_params = {}
-        if ssl:
-            ssl_params = {
-                "ssl": True,
-                "ssl_ca_certs": ssl_ca_certs,
-                "ssl_certfile": ssl_certfile,
-                "ssl_keyfile": ssl_keyfile
-            }
-            # Remove None values
-            ssl_params = {k: v for k, v in ssl_params.items() if v is not None}
-            
-        r = redis.Redis(host=host, port=port, username=username, password=password, db=db, **ssl_params)
         info = r.info()
-    except redis.exceptions.AuthenticationError:
-        print(f"\033[91m[redis] ERROR: Authentication failed for Redis at {host}:{port}. Please check username and password.\033[0m")
-        print(f"\033[93m[redis] HINT: If Redis requires authentication, make sure to set username and/or password in config.yml\033[0m")
-        return [], []
-    except redis.exceptions.ConnectionError as e:
-        print(f"\033[91m[redis] ERROR: Could not connect to Redis at {host}:{port}: {e}\033[0m")
+    except CONNECTION_ERRORS as e:
+        connection.failed(e)
         return [], []
     except Exception as e:
-        print(f"\033[91m[redis] Error connecting to Redis: {e}\033[0m")
+        print(f"\033[91m[redis] Error reading INFO from Redis at {host}:{port}: {e}\033[0m")
         return [], []
 
     timestamp = time.time()
@@ -2,9 +2,13 @@
 import importlib
 import argparse
 import platform
+import signal
 from datetime import datetime
+from core.checkpoint import Checkpoint
 from core.collector import Collector
 from core.config import load_config
+from core.metric import MetricBatch
+from core.spool import DiskSpool
 from urllib.parse import urlparse
 from secrets import get_secret_provider
 
@@ -88,6 +92,8 @@ def main():
             if not plugin_config:
                 plugin_config = {}
             plugin_config["debug"] = config.get("debug", False) or args.debug
+            # Metric schema: "legacy" (default) or "canonical"
+            plugin_config["schema"] = config.get("schema", "legacy")
             
             if plugin_config:
                 if config.get("debug", False) or args.debug:
@@ -99,6 +105,10 @@ def main():
                             return result()
                         return result
                     collect_with_config.__name__ = plugin_name
+                    # Per-plugin timeout used when inputs are gathered concurrently
+                    collect_with_config.gather_timeout = plugin_config.get("gather_timeout")
+                    # Per-plugin collection interval, defaults to the global interval
+                    collect_with_config.interval = plugin_config.get("interval")
                     return collect_with_config
                 inputs.append(make_collector(mod, plugin_config))
             else:
@@ -123,17 +133,32 @@ def main():
                                      if cls_name.lower() == class_name.lower()), None)
                 if output_class is None:
                     raise
+            params = dict(params or {})
+            if name == "redistimeseries" and config.get("schema") == "canonical" and "key_strategy" not in params:
+                # Canonical names repeat across series, so the key must include the labels
+                params["key_strategy"] = "labels"
+            # Name used by processor routes; defaults to the name in the config
+            alias = params.pop("alias", name)
             # Instantiate output plugin passing only **params, not config=params
             instance = output_class(**params)
+            instance.alias = alias
             output_type = getattr(instance, "output_type", "metrics")
             output_types[instance] = output_type
             outputs.append(instance)
 
+    # Load processors, applied to every input's metrics in the order listed
+    processors = []
+    for item in config.get("processors") or []:
+        for name, params in item.items():
+            mod = importlib.import_module(f"processors.{name}")
+            class_name = "".join(part.capitalize() for part in name.split("_"))
+            processors.append(getattr(mod, class_name)(**(params or {})))
+
     if args.once:
         all_metrics = []
         for collect_func in inputs:
             raw_results = collect_func()
-            if isinstance(raw_results, list):
+            if isinstance(raw_results, (list, MetricBatch)):
                 all_metrics.extend(raw_results)
             elif callable(raw_results):
                 result = raw_results()
@@ -147,6 +172,9 @@ def main():
         for output in outputs:
             if output_types.get(output) == "logs":
                 output.write(logs)
+            elif output_types.get(output) == "both":
+                output.write(metrics)
+                output.write(logs)
             else:
                 output.write(metrics)
     else:
@@ -159,9 +187,35 @@ def main():
             "max_buffer_size": config.get("max_buffer_size", 5000)
         }
 
+        if config.get("write_batch_size"):
+            collector_args["write_batch_size"] = config["write_batch_size"]
+
         if "warn_on_buffer" in config:
             collector_args["warn_on_buffer"] = config["warn_on_buffer"]
 
+        if config.get("concurrent_inputs"):
+            collector_args["concurrent_inputs"] = True
+            collector_args["max_workers"] = config.get("max_workers", 4)
+            collector_args["input_timeout"] = config.get("input_timeout")
+
+        if config.get("background_flush"):
+            collector_args["background_flush"] = True
+            collector_args["flush_batch_size"] = config.get("flush_batch_size")
+
+        if config.get("spool"):
+            collector_args["spool"] = DiskSpool(**config["spool"])
+
+        if processors:
+            collector_args["processors"] = processors
+
+        if config.get("checkpoint"):
+            # Inputs and outputs are loaded, so their state providers are registered
+            checkpoint = Checkpoint(**config["checkpoint"])
+            checkpoint.load()
+            collector_args["checkpoint"] = checkpoint
+
+        if "series_expiry" in config:
+            collector_args["series_expiry"] = config["series_expiry"]
         collector = Collector(**collector_args)
         collector.output_types = output_types
         collector.debug = config.get("debug", False) or args.debug
@@ -175,11 +229,17 @@ def main():
         
         if collector.debug:
             print(f"[{datetime.now().isoformat()}] [rtcollector] Running in DEBUG mode")
-        
+
+        # Treat SIGTERM like Ctrl+C so buffers are flushed and spooled on shutdown
+        def handle_sigterm(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, handle_sigterm)
+
         try:
             collector.run()
         except KeyboardInterrupt:
             print("\n[rtcollector] Stopped by user.")
+            collector.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
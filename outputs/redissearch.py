@@ -2,10 +2,39 @@ import redis
 import json
 import time
 import socket
+import hashlib
+import threading
+from datetime import datetime
 from utils.debug import debug_log
+from utils.duration import parse_duration_ms
+from utils.redis_conn import CONNECTION_ERRORS, get_connection
+
+# Counter reserving document ids; compaction must never expire it
+ID_KEY = "log:id"
+
+# Index schema: field -> RediSearch type. Fields we only ever filter on by
+# exact value are TAGs, which skip tokenization and index far smaller than TEXT.
+DEFAULT_FIELDS = {
+    "timestamp": "NUMERIC SORTABLE",
+    "message": "TEXT",
+    "level": "TAG",
+    "appname": "TAG",
+    "procid": "TAG",
+    "host": "TAG",
+    "remote_ip": "TAG",
+    "name": "TAG",
+    "facility": "TAG",
+    "severity": "TAG",
+    "source": "TAG",
+}
+FIELD_TYPES = ("TEXT", "TAG", "NUMERIC")
+STORAGE_TYPES = ("json", "hash")
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
 
 class RedisSearch:
-    def __init__(self, config=None, host="localhost", port=6379, db=0, index="logs_idx", key_prefix="log:", hostname=None, username=None, password=None, ssl=False, ssl_ca_certs=None, ssl_certfile=None, ssl_keyfile=None):
+    def __init__(self, config=None, host="localhost", port=6379, db=0, index="logs_idx", key_prefix="log:", hostname=None, username=None, password=None, ssl=False, ssl_ca_certs=None, ssl_certfile=None, ssl_keyfile=None, retention=None, compaction_interval="1h", compaction_batch=1000, storage="json", fields=None, reconnect=None):
         # Accept both config dict or direct params for compatibility
         if config is not None:
             self.host = config.get("host", host)
@@ -21,6 +50,7 @@ class RedisSearch:
             self.ssl_ca_certs = config.get("ssl_ca_certs", ssl_ca_certs)
             self.ssl_certfile = config.get("ssl_certfile", ssl_certfile)
             self.ssl_keyfile = config.get("ssl_keyfile", ssl_keyfile)
+            reconnect = config.get("reconnect", reconnect)
         else:
             self.host = host
             self.port = port
@@ -36,137 +66,165 @@ class RedisSearch:
             self.ssl_certfile = ssl_certfile
             self.ssl_keyfile = ssl_keyfile
             
-        # Connect to Redis
-        try:
-            # Configure SSL if enabled
-            ssl_params = None
-            if self.ssl:
-                ssl_params = {
-                    "ssl": True,
-                    "ssl_ca_certs": self.ssl_ca_certs,
-                    "ssl_certfile": self.ssl_certfile,
-                    "ssl_keyfile": self.ssl_keyfile
-                }
-                # Remove None values
-                ssl_params = {k: v for k, v in ssl_params.items() if v is not None}
-            
-            # Create Redis connection with auth and SSL if configured
-            try:
-                self.redis = redis.Redis(
-                    host=self.host, 
-                    port=self.port, 
-                    db=self.db,
-                    username=self.username,
-                    password=self.password,
-                    **ssl_params if ssl_params else {}
-                )
-                # Test connection
-                self.redis.ping()
-                debug_log("RedisSearch", f"Successfully connected to Redis at {self.host}:{self.port}", {"debug": self.debug})
-            except redis.exceptions.AuthenticationError:
-                print(f"\033[91m[RedisSearch] ERROR: Authentication failed for Redis at {self.host}:{self.port}. Please check username and password.\033[0m")
-                print(f"\033[93m[RedisSearch] HINT: If Redis requires authentication, make sure to set username and/or password in config.yml\033[0m")
-                self.redis = None
-            except redis.exceptions.ConnectionError as e:
-                print(f"\033[91m[RedisSearch] ERROR: Could not connect to Redis at {self.host}:{self.port}: {e}\033[0m")
-                self.redis = None
+        # Shared connection: reconnects with backoff after Redis goes away
+        self._conn = get_connection(
+            "RedisSearch", host=self.host, port=self.port, db=self.db, username=self.username, password=self.password,
+            ssl=self.ssl, ssl_ca_certs=self.ssl_ca_certs, ssl_certfile=self.ssl_certfile, ssl_keyfile=self.ssl_keyfile,
+            **(reconnect or {})
+        )
+        self.redis = self._conn.client()
+        if self.redis is not None:
             debug_log("RedisSearch", f"Successfully connected to Redis at {self.host}:{self.port}", {"debug": self.debug})
-        except Exception as e:
-            print(f"[RedisSearch] Failed to connect to Redis at {self.host}:{self.port}: {e}")
-            self.redis = None
+            
+        # Documents expire this long after they are written; 0 keeps them forever
+        if config is not None:
+            retention = config.get("retention", retention)
+            compaction_interval = config.get("compaction_interval", compaction_interval)
+            compaction_batch = config.get("compaction_batch", compaction_batch)
+            storage = config.get("storage", storage)
+            fields = config.get("fields", fields)
+        self.retention = parse_duration_ms(retention) if retention else 0
+        self.compaction_interval = parse_duration_ms(compaction_interval) / 1000
+        self.compaction_batch = int(compaction_batch)
+
+        # Documents are stored as JSON (JSON.SET) or as hashes (HSET)
+        self.storage = str(storage).lower()
+        if self.storage not in STORAGE_TYPES:
+            raise ValueError(f"RedisSearch storage must be one of {', '.join(STORAGE_TYPES)}, got {storage!r}")
+        # Field overrides, e.g. {"message": "TEXT", "procid": "NUMERIC", "source": None}
+        self.fields = dict(DEFAULT_FIELDS)
+        for field, field_type in (fields or {}).items():
+            if not field_type:
+                self.fields.pop(field, None)
+                continue
+            field_type = str(field_type).upper()
+            if field_type.split()[0] not in FIELD_TYPES:
+                raise ValueError(f"RedisSearch field '{field}' has unknown type {field_type!r}, expected one of {', '.join(FIELD_TYPES)}")
+            self.fields[field] = field_type
+
+        # The configured index name is an alias; documents are indexed by a
+        # versioned index named after the schema, so a schema change builds a
+        # new index and moves the alias once it has caught up
+        fingerprint = hashlib.blake2b(json.dumps([self.storage, self.prefix, self.fields], sort_keys=True).encode(), digest_size=4).hexdigest()
+        self.versioned_index = f"{self.index_name}_{fingerprint}"
+        self._alias_pending = False
+        self._next_alias_check = 0
             
         # Create or verify the index
         self.ensure_index()
 
+        self._stop_compaction = threading.Event()
+        self._compaction_thread = None
+        if self.retention:
+            self._compaction_thread = threading.Thread(target=self._compaction_loop, name="rtcollector-redissearch-compaction", daemon=True)
+            self._compaction_thread.start()
+
     def ensure_index(self):
-        """Ensure the search index exists with the correct schema"""
+        """Ensure the versioned index for the configured schema exists and the alias points at it"""
         if not self.redis:
             print("[RedisSearch] Cannot ensure index: Redis connection not available")
             return False
             
         try:
-            # Check if index exists
-            try:
-                # Try to get info about the index
-                self.redis.execute_command('FT.INFO', self.index_name)
-                debug_log("RedisSearch", f"Index {self.index_name} already exists", {"debug": self.debug})
-            except redis.exceptions.ResponseError as e:
-                if "unknown index" in str(e).lower():
-                    # Index doesn't exist, create it
-                    debug_log("RedisSearch", f"Creating index {self.index_name}", {"debug": self.debug})
-                    
-                    # Create index using raw Redis command
-                    create_cmd = [
-                        'FT.CREATE', self.index_name,
-                        'ON', 'JSON',
-                        'PREFIX', '1', self.prefix,
-                        'SCHEMA',
-                        '$.timestamp', 'AS', 'timestamp', 'NUMERIC', 'SORTABLE',
-                        '$.message', 'AS', 'message', 'TEXT',
-                        '$.level', 'AS', 'level', 'TEXT',
-                        '$.appname', 'AS', 'appname', 'TEXT',
-                        '$.procid', 'AS', 'procid', 'TEXT',
-                        '$.host', 'AS', 'host', 'TEXT',
-                        '$.remote_ip', 'AS', 'remote_ip', 'TEXT',
-                        '$.name', 'AS', 'name', 'TEXT',
-                        '$.facility', 'AS', 'facility', 'TAG',
-                        '$.severity', 'AS', 'severity', 'TAG',
-                        '$.source', 'AS', 'source', 'TAG'
-                    ]
-                    
-                    try:
-                        self.redis.execute_command(*create_cmd)
-                        debug_log("RedisSearch", f"Successfully created index {self.index_name}", {"debug": self.debug})
-                    except Exception as create_err:
-                        print(f"[RedisSearch] Error creating index: {create_err}")
-                        return False
-                else:
-                    print(f"[RedisSearch] Error checking index: {e}")
+            if self._index_info(self.versioned_index) is None:
+                debug_log("RedisSearch", f"Creating index {self.versioned_index}", {"debug": self.debug})
+                try:
+                    self.redis.execute_command(*self._create_command())
+                    debug_log("RedisSearch", f"Successfully created index {self.versioned_index}", {"debug": self.debug})
+                except Exception as create_err:
+                    print(f"[RedisSearch] Error creating index: {create_err}")
                     return False
-                    
+            else:
+                debug_log("RedisSearch", f"Index {self.versioned_index} already exists", {"debug": self.debug})
+
+            self._alias_pending = not self._switch_alias()
             return True
                 
         except Exception as e:
             print(f"[RedisSearch] Failed to ensure index: {e}")
             return False
 
+    def _create_command(self):
+        if self.storage == "hash":
+            create_cmd = ['FT.CREATE', self.versioned_index, 'ON', 'HASH', 'PREFIX', '1', self.prefix, 'SCHEMA']
+            for field, field_type in self.fields.items():
+                create_cmd += [field, *field_type.split()]
+        else:
+            create_cmd = ['FT.CREATE', self.versioned_index, 'ON', 'JSON', 'PREFIX', '1', self.prefix, 'SCHEMA']
+            for field, field_type in self.fields.items():
+                create_cmd += [f'$.{field}', 'AS', field, *field_type.split()]
+        return create_cmd
+
+    def _index_info(self, name):
+        """Return FT.INFO for an index or alias as a dict, or None if there is no such index"""
+        try:
+            info = self.redis.execute_command('FT.INFO', name)
+        except redis.exceptions.ResponseError as e:
+            message = str(e).lower()
+            if "unknown index" in message or "no such index" in message:
+                return None
+            raise
+        if isinstance(info, dict):
+            return {_text(key): value for key, value in info.items()}
+        return {_text(key): value for key, value in zip(info[::2], info[1::2])}
+
+    def _switch_alias(self):
+        """
+        Point the index alias at the versioned index.
+
+        When the alias already names another index, it is only moved once
+        the versioned index has finished indexing the documents already
+        under key_prefix, so queries never see a half-built index. An index
+        created before aliases were used holds the name itself; it is dropped
+        without its documents (FT.DROPINDEX without DD) to free the name.
+
+        Returns:
+            bool: True if the alias points at the versioned index
+        """
+        current = self._index_info(self.index_name)
+        target = _text(current.get("index_name")) if current else None
+        if target == self.versioned_index:
+            return True
+
+        if current is not None:
+            info = self._index_info(self.versioned_index) or {}
+            if str(_text(info.get("indexing", 0))) not in ("0", "0.0"):
+                debug_log("RedisSearch", f"Index {self.versioned_index} is still indexing, keeping alias {self.index_name} on {target}", {"debug": self.debug})
+                return False
+
+        if current is None:
+            self.redis.execute_command('FT.ALIASADD', self.index_name, self.versioned_index)
+        elif target == self.index_name:
+            self.redis.execute_command('FT.DROPINDEX', self.index_name)
+            self.redis.execute_command('FT.ALIASADD', self.index_name, self.versioned_index)
+            print(f"[{datetime.now().isoformat()}] [RedisSearch] Replaced index {self.index_name} with alias to {self.versioned_index}; documents were kept")
+        else:
+            self.redis.execute_command('FT.ALIASUPDATE', self.index_name, self.versioned_index)
+            print(f"[{datetime.now().isoformat()}] [RedisSearch] Moved alias {self.index_name} from {target} to {self.versioned_index}; drop the old index with FT.DROPINDEX {target} when it is no longer needed")
+        return True
+
     def write(self, log_entries):
         """Write log entries to Redis"""
         # Ensure Redis connection
-        if not self.redis:
+        client = self._conn.client()
+        if client is None:
+            # Raise so the collector keeps this output's backlog for the next flush
+            raise ConnectionError("Cannot write logs - Redis connection not available")
+        if client is not self.redis:
+            # (Re)connected since the last write: make sure the index exists
+            self.redis = client
+            self.ensure_index()
+
+        # A new index still backfilling keeps the alias on the old one; check back now and then
+        if self._alias_pending and time.monotonic() >= self._next_alias_check:
+            self._next_alias_check = time.monotonic() + 30
             try:
-                # Configure SSL if enabled
-                ssl_params = None
-                if self.ssl:
-                    ssl_params = {
-                        "ssl": True,
-                        "ssl_ca_certs": self.ssl_ca_certs,
-                        "ssl_certfile": self.ssl_certfile,
-                        "ssl_keyfile": self.ssl_keyfile
-                    }
-                    # Remove None values
-                    ssl_params = {k: v for k, v in ssl_params.items() if v is not None}
-                
-                self.redis = redis.Redis(
-                    host=self.host, 
-                    port=self.port, 
-                    db=self.db,
-                    username=self.username,
-                    password=self.password,
-                    **ssl_params if ssl_params else {}
-                )
-                self.redis.ping()
-                # Ensure index exists
-                self.ensure_index()
-            except redis.exceptions.AuthenticationError:
-                print(f"\033[91m[RedisSearch] ERROR: Authentication failed for Redis at {self.host}:{self.port}. Please check username and password.\033[0m")
-                return
-            except redis.exceptions.ConnectionError as e:
-                print(f"\033[91m[RedisSearch] Failed to reconnect to Redis: {e}\033[0m")
-                return
-            except Exception as e:
-                print(f"\033[91m[RedisSearch] Failed to reconnect to Redis: {e}\033[0m")
-                return
+                self._alias_pending = not self._switch_alias()
+            except redis.exceptions.ResponseError as e:
+                print(f"[RedisSearch] Failed to switch index alias: {e}")
+            except CONNECTION_ERRORS as e:
+                self._conn.failed(e)
+                raise
                 
         logs_to_write = []
         
@@ -188,43 +246,200 @@ class RedisSearch:
             
         debug_log("RedisSearch", f"Writing {len(logs_to_write)} log entries", {"debug": self.debug})
         
-        # Write each log entry to Redis
+        documents = []
         for entry in logs_to_write:
+            data = self._document(entry)
+            if data is None:
+                continue
             try:
-                # Convert entry to a dictionary if it's not already
-                if hasattr(entry, "to_dict") and callable(entry.to_dict):
-                    data = entry.to_dict()
-                elif hasattr(entry, "__dict__"):
-                    data = entry.__dict__
-                elif isinstance(entry, dict):
-                    data = entry
+                if self.storage == "hash":
+                    documents.append(self._hash_fields(data))
                 else:
-                    debug_log("RedisSearch", f"Skipping invalid entry type: {type(entry)}", {"debug": self.debug})
-                    continue
-
-                # Ensure required fields
-                if "host" not in data:
-                    data["host"] = self.hostname
-                if "timestamp" not in data:
-                    data["timestamp"] = int(time.time() * 1000)
-                if "level" not in data and "severity" in data:
-                    data["level"] = data["severity"]
-                if "source" not in data:
-                    data["source"] = "unknown"
-                
-                # Generate a unique key
-                key = self.redis.incr("log:id")
-                redis_key = f"{self.prefix}{key}"
-                
-                # Store the log entry using JSON.SET
-                json_str = json.dumps(data)
-                debug_log("RedisSearch", f"Writing to {redis_key}: {json_str[:100]}...", {"debug": self.debug})
-                    
-                self.redis.execute_command('JSON.SET', redis_key, '$', json_str)
-                
-            except Exception as e:
-                print(f"[RedisSearch] Error writing log entry: {e}")
+                    documents.append(json.dumps(self._typed(data)))
+            except (TypeError, ValueError) as e:
+                print(f"[RedisSearch] Error encoding log entry: {e}")
                 debug_log("RedisSearch", f"Failed entry: {entry}", {"debug": self.debug})
+        if documents:
+            self._write_documents(documents)
+
+    def _document(self, entry):
+        """Return the JSON document for a log entry, with the required fields filled in."""
+        # Convert entry to a dictionary if it's not already
+        if hasattr(entry, "to_dict") and callable(entry.to_dict):
+            data = entry.to_dict()
+        elif isinstance(entry, dict):
+            # Copy: the same entry may still be pending for other outputs
+            data = dict(entry)
+        elif hasattr(entry, "__dict__"):
+            data = dict(entry.__dict__)
+        else:
+            debug_log("RedisSearch", f"Skipping invalid entry type: {type(entry)}", {"debug": self.debug})
+            return None
+
+        # Ensure required fields
+        if "host" not in data:
+            data["host"] = self.hostname
+        if "timestamp" not in data:
+            data["timestamp"] = int(time.time() * 1000)
+        if "level" not in data and "severity" in data:
+            data["level"] = data["severity"]
+        if "source" not in data:
+            data["source"] = "unknown"
+        return data
+
+    def _typed(self, data):
+        """Match JSON value types to the index: TAG fields must be strings and NUMERIC fields numbers."""
+        for field, field_type in self.fields.items():
+            value = data.get(field)
+            if value is None:
+                continue
+            if field_type.startswith("TAG") and isinstance(value, (int, float)):
+                data[field] = str(value)
+            elif field_type.startswith("NUMERIC") and isinstance(value, str):
+                try:
+                    data[field] = float(value) if "." in value else int(value)
+                except ValueError:
+                    pass
+        return data
+
+    def _hash_fields(self, data):
+        """Flatten a document into HSET field values; nested values are stored as JSON."""
+        mapping = {}
+        for field, value in data.items():
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (str, bytes, int, float)):
+                value = json.dumps(value)
+            mapping[str(field)] = value
+        return mapping
+
+    def _write_documents(self, documents):
+        """
+        Store documents under consecutive ids in two round trips.
+
+        One INCRBY reserves a block of ids for the whole batch, then every
+        JSON.SET or HSET (followed by its PEXPIRE when retention is set)
+        goes out in a single non-transactional pipeline. A document Redis
+        rejects is reported on its own without failing the others; a lost
+        connection fails the batch so the collector retries it.
+        """
+        try:
+            last_id = self.redis.incrby(ID_KEY, len(documents))
+            first_id = last_id - len(documents) + 1
+            pipe = self.redis.pipeline(transaction=False)
+            keys = []
+            for offset, document in enumerate(documents):
+                redis_key = f"{self.prefix}{first_id + offset}"
+                debug_log("RedisSearch", f"Writing to {redis_key}: {str(document)[:100]}...", {"debug": self.debug})
+                if self.storage == "hash":
+                    pipe.hset(redis_key, mapping=document)
+                else:
+                    pipe.execute_command('JSON.SET', redis_key, '$', document)
+                if self.retention:
+                    # The TTL travels in the same pipeline as the document
+                    pipe.pexpire(redis_key, self.retention)
+                keys.append(redis_key)
+            results = pipe.execute(raise_on_error=False)
+            if self.retention:
+                results = results[::2]
+        except CONNECTION_ERRORS as e:
+            # Connection lost: fail the batch so the collector retries it
+            self._conn.failed(e)
+            raise
+
+        failed = 0
+        for redis_key, document, result in zip(keys, documents, results):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"[RedisSearch] Error writing log entry {redis_key}: {result}")
+                debug_log("RedisSearch", f"Failed entry: {document}", {"debug": self.debug})
+        if failed:
+            print(f"[RedisSearch] {failed} of {len(documents)} log entries were rejected")
+
+    def _compaction_loop(self):
+        while not self._stop_compaction.wait(self.compaction_interval):
+            try:
+                self.compact()
+            except CONNECTION_ERRORS as e:
+                self._conn.failed(e)
+            except Exception as e:
+                print(f"[RedisSearch] Compaction failed: {e}")
+
+    def close(self, timeout=5):
+        """Stop the compaction thread, waiting up to timeout seconds for a pass in progress."""
+        self._stop_compaction.set()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join(timeout)
+            self._compaction_thread = None
+
+    def compact(self):
+        """
+        Give documents without a TTL one based on their timestamp.
+
+        Documents written before retention was configured (or by another
+        writer) never expire on their own. Keys under key_prefix are walked
+        with SCAN, compaction_batch at a time with a short pause in between,
+        so Redis is never blocked and ingestion keeps its share of the
+        connection pool. A document whose timestamp is older than retention
+        is expired at once; Redis drops expired documents from the index.
+
+        Returns:
+            int: Number of documents given a TTL
+        """
+        client = self._conn.client()
+        if client is None or not self.retention:
+            return 0
+        updated = 0
+        batch = []
+        for key in client.scan_iter(match=f"{self.prefix}*", count=self.compaction_batch):
+            if self._stop_compaction.is_set():
+                # Shutting down; the next run starts the walk over
+                return updated
+            batch.append(key)
+            if len(batch) >= self.compaction_batch:
+                updated += self._expire_batch(client, batch)
+                batch = []
+                time.sleep(0.01)
+        if batch:
+            updated += self._expire_batch(client, batch)
+        if updated:
+            print(f"[{datetime.now().isoformat()}] [RedisSearch] Compaction set a TTL on {updated} documents without one")
+        return updated
+
+    def _expire_batch(self, client, keys):
+        keys = [key for key in keys if (key.decode() if isinstance(key, bytes) else key) != ID_KEY]
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.pttl(key)
+        persistent = [key for key, ttl in zip(keys, pipe.execute(raise_on_error=False)) if ttl == -1]
+        if not persistent:
+            return 0
+
+        pipe = client.pipeline(transaction=False)
+        for key in persistent:
+            if self.storage == "hash":
+                pipe.hget(key, "timestamp")
+            else:
+                pipe.execute_command('JSON.GET', key, '$.timestamp')
+        expire_at = []
+        for key, result in zip(persistent, pipe.execute(raise_on_error=False)):
+            try:
+                timestamp = float(result) if self.storage == "hash" else json.loads(result)[0]
+            except (TypeError, ValueError, IndexError):
+                timestamp = None
+            if not isinstance(timestamp, (int, float)):
+                # Not one of our documents (or no timestamp): leave it alone
+                continue
+            if timestamp < 1e11:
+                # Seconds rather than milliseconds
+                timestamp *= 1000
+            expire_at.append((key, int(timestamp) + self.retention))
+
+        pipe = client.pipeline(transaction=False)
+        for key, deadline in expire_at:
+            pipe.pexpireat(key, deadline)
+        pipe.execute(raise_on_error=False)
+        return len(expire_at)
 
     supports_logs = True
     supports_metrics = False
@@ -0,0 +1,120 @@
+import json
+import socket
+from core.metric import Metric, MetricBatch
+from core.series import registry
+from utils.debug import debug_log
+from utils.redis_conn import CONNECTION_ERRORS, get_connection
+
+STREAM_BY = ("host", "plugin", "single")
+
+class RedisStreams:
+    """
+    Append logs and metrics to Redis Streams for consumers that tail data as it arrives.
+
+    Every log entry and metric point becomes one XADD entry on a stream
+    named after its kind and, depending on stream_by, its host or plugin
+    (e.g. "rtcollector:metrics:web01"). Each XADD trims its stream with
+    MAXLEN ~ maxlen, which Redis applies a whole node at a time, so trimming
+    costs next to nothing. A batch goes out in one non-transactional
+    pipeline. Workers can read the streams with consumer groups
+    (XREADGROUP) and process entries in parallel.
+    """
+    supports_logs = True
+    supports_metrics = True
+    output_type = "both"
+
+    def __init__(self, host="localhost", port=6379, db=0, hostname=None, debug=False, password=None, username=None, ssl=False, ssl_ca_certs=None, ssl_certfile=None, ssl_keyfile=None, stream_prefix="rtcollector:", stream_by="host", maxlen=100000, reconnect=None):
+        # Shared connection: reconnects with backoff after Redis goes away
+        self._conn = get_connection(
+            "RedisStreams", host=host, port=port, db=db, username=username, password=password,
+            ssl=ssl, ssl_ca_certs=ssl_ca_certs, ssl_certfile=ssl_certfile, ssl_keyfile=ssl_keyfile,
+            **(reconnect or {})
+        )
+
+        self.debug = debug
+        self.config = {"debug": debug}  # Create a config dict for debug_log
+        if stream_by not in STREAM_BY:
+            raise ValueError(f"Unknown stream_by {stream_by!r}, expected one of {', '.join(STREAM_BY)}")
+        self.stream_by = stream_by
+        self.stream_prefix = stream_prefix
+        # Approximate length each stream is trimmed to; 0 disables trimming
+        self.maxlen = int(maxlen or 0)
+        if hostname is not None and isinstance(hostname, str) and hostname.strip():
+            self.hostname = hostname
+        else:
+            self.hostname = socket.gethostname()
+        # Per-series (stream, name, labels JSON), keyed by registry id
+        self._fields_cache = registry.cache(f"RedisStreams:{self.hostname}:{self.stream_prefix}:{self.stream_by}")
+
+    def _stream(self, kind, host, plugin):
+        if self.stream_by == "host":
+            return f"{self.stream_prefix}{kind}:{host}"
+        if self.stream_by == "plugin":
+            return f"{self.stream_prefix}{kind}:{plugin}"
+        return f"{self.stream_prefix}{kind}"
+
+    def _metric_fields(self, series_id):
+        fields = self._fields_cache.get(series_id)
+        if fields is None:
+            name, labels = registry.info(series_id)
+            host = labels.get("host", self.hostname)
+            # Inputs label their series with their plugin name; otherwise use the name prefix
+            plugin = labels.get("source")
+            if not plugin or plugin == "unknown":
+                plugin = name.split("_", 1)[0]
+            stream = self._stream("metrics", host, plugin)
+            fields = self._fields_cache[series_id] = (stream, name, json.dumps(labels, sort_keys=True))
+        return fields
+
+    def _log_fields(self, entry):
+        """Return the stream and flat field values for a log entry; nested values are stored as JSON."""
+        if hasattr(entry, "to_dict") and callable(entry.to_dict):
+            entry = entry.to_dict()
+        fields = {}
+        for field, value in entry.items():
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (str, bytes, int, float)):
+                value = json.dumps(value, default=str)
+            fields[str(field)] = value
+        source = entry.get("source")
+        if not source or source == "unknown":
+            # syslog_<appname> and similar entry names start with the plugin name
+            source = str(entry.get("name", "logs")).split("_", 1)[0]
+        return self._stream("logs", entry.get("host", self.hostname), source), fields
+
+    def write(self, entries):
+        if not entries:
+            return
+        client = self._conn.client()
+        if client is None:
+            # Raise so the collector keeps this output's backlog for the next flush
+            raise ConnectionError("Cannot write to streams - Redis connection not available")
+
+        trim = {"maxlen": self.maxlen, "approximate": True} if self.maxlen else {}
+        pipe = client.pipeline(transaction=False)
+        count = 0
+        if isinstance(entries, MetricBatch) or isinstance(next(iter(entries)), Metric):
+            for series_id, value, timestamp in MetricBatch.from_metrics(entries).rows():
+                stream, name, labels = self._metric_fields(series_id)
+                pipe.xadd(stream, {"name": name, "value": value, "timestamp": timestamp, "labels": labels}, **trim)
+                count += 1
+        else:
+            for entry in entries:
+                if not isinstance(entry, dict) and not hasattr(entry, "to_dict"):
+                    debug_log("RedisStreams", f"Skipping invalid entry type: {type(entry)}", self.config)
+                    continue
+                stream, fields = self._log_fields(entry)
+                pipe.xadd(stream, fields, **trim)
+                count += 1
+
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except CONNECTION_ERRORS as e:
+            # Connection lost: fail the batch so the collector retries it
+            self._conn.failed(e)
+            raise
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            print(f"[RedisStreams] {len(failed)} of {count} entries were rejected: {failed[0]}")
+        debug_log("RedisStreams", f"Appended {count - len(failed)} entries", self.config)
@@ -1,62 +1,116 @@
+import fnmatch
+import hashlib
+import json
+import re
 import redis
 import socket
 import time
-from core.metric import Metric
+from core.checkpoint import register_state
+from core.metric import Metric, MetricBatch
+from core.series import registry
 from utils.debug import debug_log
+from utils.duration import parse_duration_ms
+from utils.redis_conn import CONNECTION_ERRORS, get_connection
+
+def _labels_hash(labels):
+    """Return a short hash of the labels that does not depend on their order."""
+    canonical = "\x1f".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
+
+
+_DUPLICATE_POLICIES = ("block", "first", "last", "min", "max", "sum")
+_ENCODINGS = ("compressed", "uncompressed")
+
+def _compile_policy(policy):
+    """Validate a policy from the config and compile its name pattern."""
+    if "match" not in policy:
+        raise ValueError(f"Redistimeseries policy needs a 'match' pattern: {policy}")
+    options = []
+    if "retention" in policy:
+        options += ["RETENTION", str(parse_duration_ms(policy["retention"]))]
+    if "chunk_size" in policy:
+        chunk_size = int(policy["chunk_size"])
+        if chunk_size % 8 or not 48 <= chunk_size <= 1048576:
+            raise ValueError(f"chunk_size must be a multiple of 8 between 48 and 1048576, got {chunk_size}")
+        options += ["CHUNK_SIZE", str(chunk_size)]
+    if "encoding" in policy:
+        encoding = str(policy["encoding"]).lower()
+        if encoding not in _ENCODINGS:
+            raise ValueError(f"encoding must be one of {_ENCODINGS}, got {policy['encoding']!r}")
+        options += ["ENCODING", encoding.upper()]
+    if "duplicate_policy" in policy:
+        duplicate_policy = str(policy["duplicate_policy"]).lower()
+        if duplicate_policy not in _DUPLICATE_POLICIES:
+            raise ValueError(f"duplicate_policy must be one of {_DUPLICATE_POLICIES}, got {policy['duplicate_policy']!r}")
+        options += ["DUPLICATE_POLICY", duplicate_policy.upper()]
+    return re.compile(fnmatch.translate(policy["match"])), options
+
+
+_AGGREGATIONS = ("avg", "sum", "min", "max", "range", "count", "first", "last", "std.p", "std.s", "var.p", "var.s", "twa")
+
+def _compile_compaction(rule):
+    """
+    Validate a compaction rule from the config.
+
+    Returns (pattern, aggregation, bucket, bucket_ms, retention_ms), where bucket is
+    the bucket as written in the config, used in destination keys and labels.
+    """
+    aggregation = str(rule.get("aggregation", "")).lower()
+    if aggregation not in _AGGREGATIONS:
+        raise ValueError(f"Compaction aggregation must be one of {_AGGREGATIONS}, got {rule.get('aggregation')!r}")
+    if "bucket" not in rule:
+        raise ValueError(f"Compaction rule needs a 'bucket' duration: {rule}")
+    bucket_ms = parse_duration_ms(rule["bucket"])
+    if bucket_ms <= 0:
+        raise ValueError(f"Compaction bucket must be positive, got {rule['bucket']!r}")
+    retention = parse_duration_ms(rule["retention"]) if "retention" in rule else None
+    pattern = re.compile(fnmatch.translate(rule.get("match", "*")))
+    return pattern, aggregation, str(rule["bucket"]), bucket_ms, retention
+
 
 class Redistimeseries:
     supports_logs = False
     supports_metrics = True
-    def __init__(self, host="localhost", port=6379, db=0, retention="0", hostname=None, debug=False, password=None, username=None, ssl=False, ssl_ca_certs=None, ssl_certfile=None, ssl_keyfile=None):
-        # Configure SSL if enabled
-        ssl_params = {}
-        if ssl:
-            ssl_params = {
-                "ssl": True,
-                "ssl_ca_certs": ssl_ca_certs,
-                "ssl_certfile": ssl_certfile,
-                "ssl_keyfile": ssl_keyfile
-            }
-            # Remove None values
-            ssl_params = {k: v for k, v in ssl_params.items() if v is not None}
-        
-        try:
-            self.r = redis.Redis(host=host, port=port, db=db, username=username, password=password, **ssl_params)
-            # Test connection with ping
-            self.r.ping()
-        except redis.exceptions.AuthenticationError:
-            print(f"\033[91m[Redistimeseries] ERROR: Authentication failed for Redis at {host}:{port}. Please check username and password.\033[0m")
-            print(f"\033[93m[Redistimeseries] HINT: If Redis requires authentication, make sure to set username and/or password in config.yml\033[0m")
-            self.r = None
-        except redis.exceptions.ConnectionError as e:
-            print(f"\033[91m[Redistimeseries] ERROR: Could not connect to Redis at {host}:{port}: {e}\033[0m")
-            self.r = None
-        except Exception as e:
-            print(f"\033[91m[Redistimeseries] ERROR: {e}\033[0m")
-            self.r = None
+    def __init__(self, host="localhost", port=6379, db=0, retention="0", hostname=None, debug=False, password=None, username=None, ssl=False, ssl_ca_certs=None, ssl_certfile=None, ssl_keyfile=None, madd_batch_size=500, key_strategy="name", policies=None, compactions=None, reconnect=None):
+        # Shared connection: reconnects with backoff after Redis goes away
+        self._conn = get_connection(
+            "Redistimeseries", host=host, port=port, db=db, username=username, password=password,
+            ssl=ssl, ssl_ca_certs=ssl_ca_certs, ssl_certfile=ssl_certfile, ssl_keyfile=ssl_keyfile,
+            **(reconnect or {})
+        )
+        self.r = self._conn.client()
             
         self.debug = debug
         self.config = {"debug": debug}  # Create a config dict for debug_log
+        # Points per TS.MADD command
+        self.madd_batch_size = max(1, int(madd_batch_size))
+        # "name": the metric name is the key; "labels": name plus a hash of the labels
+        if key_strategy not in ("name", "labels"):
+            raise ValueError(f"Unknown key_strategy {key_strategy!r}, expected 'name' or 'labels'")
+        self.key_strategy = key_strategy
         
-        if isinstance(retention, str):
-            if retention.endswith("d"):
-                self.retention = int(float(retention[:-1]) * 86400000)
-            elif retention.endswith("h"):
-                self.retention = int(float(retention[:-1]) * 3600000)
-            elif retention.endswith("y"):
-                self.retention = int(float(retention[:-1]) * 365 * 86400000)
-            else:
-                self.retention = int(retention)
-        else:
-            self.retention = int(retention)
+        self.retention = parse_duration_ms(retention)
         if self.retention == 0:
             print("\033[93m[Redistimeseries] WARNING: Retention is set to 0. Data will be stored indefinitely. This may lead to memory or disk usage issues over time.\033[0m")
+        # Per-pattern creation options, first match wins; unmatched series use the defaults
+        self.policies = [_compile_policy(policy) for policy in (policies or [])]
+        self._policy_args = {}
+        # Downsampling rules created alongside every matching series
+        self.compactions = [_compile_compaction(rule) for rule in (compactions or [])]
         if hostname is not None and isinstance(hostname, str) and hostname.strip():
             self.hostname = hostname
         else:
             self.hostname = socket.gethostname()
         self.created_keys = set()
-        
+        # Keys provisioned in earlier runs are not created or relabeled again. The
+        # state name covers the provisioning settings, so changing them provisions anew.
+        settings = json.dumps([self.retention, policies or [], compactions or []], sort_keys=True, default=str)
+        fingerprint = hashlib.blake2b(settings.encode("utf-8"), digest_size=4).hexdigest()
+        register_state(f"Redistimeseries:{host}:{port}/{db}:{fingerprint}", lambda: sorted(self.created_keys), self.created_keys.update)
+        # Per-series key and label arguments, keyed by registry id. Compactions add
+        # labels, so only outputs with the same provisioning settings share them.
+        self._args_cache = registry.cache(f"Redistimeseries:{self.hostname}:{self.key_strategy}:{fingerprint}")
+
         # Create indexes for common labels
         self._create_indexes()
 
@@ -77,8 +131,11 @@ class Redistimeseries:
                 "LABELS", "type", "host_index"
             )
             debug_log("Redistimeseries", "Created host index time series", self.config)
+            self.created_keys.add("rtcollector:hosts:index")
         except redis.exceptions.ResponseError as e:
-            if "already exists" not in str(e):
+            if "already exists" in str(e):
+                self.created_keys.add("rtcollector:hosts:index")
+            else:
                 debug_log("Redistimeseries", f"Could not create host index: {e}", self.config)
         
         # Create index for common labels using FT.CREATE if RediSearch is available
@@ -114,166 +171,253 @@ class Redistimeseries:
                                 debug_log("Redistimeseries", f"Could not create index for {label}: {e}", self.config)
                 except Exception as e:
                     debug_log("Redistimeseries", f"Error in alternative indexing: {e}", self.config)
-        
-        # Test if indexing works
-        try:
-            # Try a simple query to see if indexing works
-            result = self.r.execute_command("TS.QUERYINDEX", "host=atila")
-            debug_log("Redistimeseries", f"Index test result: {result}", self.config)
-        except Exception as e:
-            debug_log("Redistimeseries", f"Index test failed: {e}", self.config)
-            debug_log("Redistimeseries", "This is expected if no metrics have been collected yet", self.config)
-    
+
+    def _series_args(self, series_id):
+        """
+        Return (key, labels, label_args) for a registry series id.
+
+        Computed once per series and cached: labels always carry a host
+        label, and label_args is the flattened [k1, v1, ...] list used by
+        TS.CREATE. With key_strategy "labels" the key is the name followed by
+        a hash of the sorted labels, so series sharing a name stay apart, and
+        the name is added as a __name__ label for TS.MRANGE filters.
+        """
+        args = self._args_cache.get(series_id)
+        if args is None:
+            name, labels = registry.info(series_id)
+            label_args = registry.label_args(series_id)
+            if "host" not in labels:
+                labels = {**labels, "host": self.hostname}
+                label_args = label_args + ["host", self.hostname]
+            key = name
+            if self.key_strategy == "labels":
+                key = f"{name}:{_labels_hash(labels)}"
+                # The name is no longer the whole key, so make it filterable
+                label_args = label_args + ["__name__", name]
+            if self.compactions:
+                # Set raw series apart from their downsampled copies in label filters
+                label_args = label_args + ["aggregation", "raw"]
+            args = self._args_cache[series_id] = (key, labels, label_args)
+        return args
+
+    def _create_options(self, name):
+        """
+        Return the TS.CREATE options for a metric name.
+
+        The first policy whose pattern matches the name overrides the global
+        retention and DUPLICATE_POLICY LAST; resolved once per name.
+        """
+        options = self._policy_args.get(name)
+        if options is None:
+            defaults = {"RETENTION": str(self.retention), "DUPLICATE_POLICY": "LAST"}
+            for pattern, policy_options in self.policies:
+                if pattern.match(name):
+                    defaults.update(zip(policy_options[::2], policy_options[1::2]))
+                    break
+            options = self._policy_args[name] = [arg for item in defaults.items() for arg in item]
+        return options
+
+    def _provision_commands(self, series_id):
+        """
+        Return the commands creating a new series and its compactions.
+
+        The first command is the series' TS.CREATE. Each matching compaction
+        rule adds a TS.CREATE for its destination key ("<key>:<aggregation>_<bucket>")
+        and the TS.CREATERULE linking it. The destination keeps the source
+        labels, except that aggregation and bucket name the rule and
+        __name__ (with key_strategy "labels") gets the same suffix as the key,
+        so filters on the plain name only match the raw series.
+        """
+        key, _, label_args = self._series_args(series_id)
+        name = registry.name(series_id)
+        commands = [["TS.CREATE", key, *self._create_options(name), "LABELS", *label_args]]
+        for pattern, aggregation, bucket, bucket_ms, retention in self.compactions:
+            if not pattern.match(name):
+                continue
+            dest_key = f"{key}:{aggregation}_{bucket}"
+            dest_labels = []
+            for label, value in zip(label_args[::2], label_args[1::2]):
+                if label == "aggregation":
+                    continue
+                if label == "__name__":
+                    value = f"{value}:{aggregation}_{bucket}"
+                dest_labels += [label, value]
+            commands.append([
+                "TS.CREATE", dest_key,
+                "RETENTION", str(self.retention if retention is None else retention),
+                "LABELS", *dest_labels, "aggregation", aggregation, "bucket", bucket
+            ])
+            commands.append(["TS.CREATERULE", key, dest_key, "AGGREGATION", aggregation, str(bucket_ms)])
+        return commands
+
     def write(self, metrics):
-        if not self.r:
-            print("\033[91m[Redistimeseries] ERROR: Cannot write metrics - Redis connection not available\033[0m")
-            return
-            
-        pipe = self.r.pipeline()
+        client = self._conn.client()
+        if client is None:
+            # Raise so the collector keeps this output's backlog for the next flush
+            raise ConnectionError("Cannot write metrics - Redis connection not available")
+
         hosts_seen = set()
-        
-        # Reset created_keys to force checking labels on existing time series
-        # This is a one-time operation that will happen only on startup
-        if not hasattr(self, '_labels_verified'):
-            self.created_keys = set()
-            self._labels_verified = True
-            print("[Redistimeseries] Verifying labels on existing time series")
-        
-        for m in metrics:
-            key = m.name
-            if key not in self.created_keys:
-                try:
-                    # Ensure labels are properly formatted
-                    labels = m.labels.copy() if m.labels else {}
-                    
-                    # Always set host label
-                    if "host" not in labels:
-                        labels["host"] = self.hostname
-                    
-                    # Track the host for our host index
-                    hosts_seen.add(labels["host"])
-                    
-                    # Format labels for TS.CREATE
-                    label_args = []
-                    for k, v in labels.items():
-                        label_args.extend([k, str(v)])
-                    
-                    # Check if key exists first
-                    try:
-                        info = self.r.execute_command("TS.INFO", key)
-                        # Key exists, check if it has labels
-                        has_labels = False
-                        for i, item in enumerate(info):
-                            if item == b"labels" and i+1 < len(info) and isinstance(info[i+1], list) and len(info[i+1]) > 0:
-                                has_labels = True
-                                break
-                        
-                        if not has_labels:
-                            # Key exists but has no labels, we need to recreate it
-                            # First, get all the data
-                            try:
-                                data = self.r.execute_command("TS.RANGE", key, "-", "+")
-                                # Delete and recreate with labels
-                                self.r.delete(key)
-                                print(f"[Redistimeseries] Recreating key {key} with labels: {labels}")
-                                self.r.execute_command(
-                                    "TS.CREATE", key,
-                                    "RETENTION", str(self.retention),
-                                    "DUPLICATE_POLICY", "LAST",
-                                    "LABELS", *label_args
-                                )
-                                # Restore data
-                                if data:
-                                    restore_pipe = self.r.pipeline()
-                                    for ts, val in data:
-                                        restore_pipe.execute_command("TS.ADD", key, ts, val)
-                                    restore_pipe.execute()
-                                    print(f"[Redistimeseries] Restored {len(data)} data points for {key}")
-                            except Exception as e:
-                                debug_log("Redistimeseries", f"Error migrating data for {key}: {e}", self.config)
-                        else:
-                            debug_log("Redistimeseries", f"Key {key} already exists with labels", self.config)
-                    except redis.exceptions.ResponseError:
-                        # Key doesn't exist, create it with labels
-                        print(f"[Redistimeseries] Creating new key {key} with labels: {labels}")
-                        self.r.execute_command(
-                            "TS.CREATE", key,
-                            "RETENTION", str(self.retention),
-                            "DUPLICATE_POLICY", "LAST",
-                            "LABELS", *label_args
-                        )
-                    
-                    # Explicitly create an index for this key's labels
-                    for label_key, label_value in labels.items():
-                        try:
-                            index_query = f"{label_key}={label_value}"
-                            self.r.execute_command("TS.QUERYINDEX", index_query)
-                            debug_log("Redistimeseries", f"Verified index for {index_query}", self.config)
-                        except Exception as e:
-                            debug_log("Redistimeseries", f"Note: Index verification for {label_key}={label_value} failed: {e}", self.config)
-                            
-                except redis.exceptions.ResponseError as e:
-                    if "already exists" not in str(e):
-                        debug_log("Redistimeseries", f"TS.CREATE failed: {e}", self.config)
-                self.created_keys.add(key)
+        samples = []
+        series = {}
 
-            try:
-                # Add data point with timestamp and value (no labels needed here as they're set at creation)
-                pipe.execute_command("TS.ADD", key, int(m.timestamp), float(m.value), "ON_DUPLICATE", "LAST")
-            except redis.exceptions.ResponseError as e:
-                if "DUPLICATE_POLICY" in str(e) or "at upsert" in str(e):
-                    # If ON_DUPLICATE doesn't work (older Redis versions), try recreating the key with DUPLICATE_POLICY
-                    try:
-                        # Ensure labels are properly formatted
-                        labels = m.labels.copy() if m.labels else {}
-                        if "host" not in labels:
-                            labels["host"] = self.hostname
-                            
-                        # Format labels for TS.CREATE
-                        label_args = []
-                        for k, v in labels.items():
-                            label_args.extend([k, str(v)])
-                            
-                        # Try to recreate with DUPLICATE_POLICY
-                        self.r.execute_command(
-                            "TS.CREATE", key,
-                            "RETENTION", str(self.retention),
-                            "DUPLICATE_POLICY", "LAST",
-                            "LABELS", *label_args
-                        )
-                        # Now try to add the value again
-                        pipe.execute_command("TS.ADD", key, int(m.timestamp), float(m.value))
-                    except redis.exceptions.ResponseError:
-                        # Last resort: use current timestamp
-                        pipe.execute_command("TS.ADD", key, "*", float(m.value))
-                else:
-                    debug_log("Redistimeseries", f"TS.ADD failed: {e}", self.config)
+        batch = MetricBatch.from_metrics(metrics)
+        for series_id, value, timestamp in batch.rows():
+            key, labels, _ = self._series_args(series_id)
+            series[key] = series_id
+            # Collect flat TS.MADD arguments: key, timestamp, value
+            hosts_seen.add(labels["host"])
+            samples.extend((key, timestamp, value))
 
+        new_series = {key: series_id for key, series_id in series.items() if key not in self.created_keys}
         try:
-            pipe.execute()
-            
-            # Update the host index with all hosts seen in this batch
+            if client is not self.r:
+                # (Re)connected since the last write: make sure the host index exists
+                self.r = client
+                self._create_indexes()
+            self._write_samples(samples, hosts_seen, new_series, series)
+        except CONNECTION_ERRORS as e:
+            self._conn.failed(e)
+            raise
+
+    def _write_samples(self, samples, hosts_seen, new_series, series=None):
+        """
+        Write flat (key, timestamp, value) samples with chunked TS.MADD calls.
+
+        Provisioning for series not seen before (TS.CREATE plus compaction
+        rules), all TS.MADD chunks and the host index update go out in one
+        non-transactional pipeline round trip.
+        Series that already existed in Redis (left over from a previous run)
+        get their labels synced with TS.ALTER in a second pipeline, so a cold
+        start costs at most two round trips. Errors are isolated: a failed
+        chunk or a rejected sample is reported without failing the others.
+        Samples for keys Redis reports as missing (deleted, or remembered from
+        a checkpoint of another server) are written once more after creating
+        the keys, when series maps each key to its series id.
+        Connection errors propagate so the collector retries.
+        """
+        pipe = self.r.pipeline(transaction=False)
+        # Provision new series (and their compactions) ahead of the samples that need them
+        provisioned = []
+        for key, series_id in new_series.items():
+            commands = self._provision_commands(series_id)
+            for command in commands:
+                pipe.execute_command(*command)
+            provisioned.append((key, series_id, commands))
+
+        chunk_args = self.madd_batch_size * 3
+        chunks = []
+        for start in range(0, len(samples), chunk_args):
+            chunk = samples[start:start + chunk_args]
+            pipe.execute_command("TS.MADD", *chunk)
+            chunks.append(chunk)
+
+        # Update the host index with all hosts seen in this batch
+        host_creates = []
+        host_samples = []
+        if hosts_seen:
             timestamp = int(time.time() * 1000)
             for host in hosts_seen:
-                try:
-                    # Store the host name in a special key
-                    host_key = f"rtcollector:hosts:{host}"
-                    if host_key not in self.created_keys:
-                        self.r.execute_command(
-                            "TS.CREATE", host_key,
-                            "RETENTION", str(self.retention),
-                            "DUPLICATE_POLICY", "LAST",
-                            "LABELS", "type", "host", "host", host
-                        )
-                        self.created_keys.add(host_key)
-                    
-                    # Add a data point to keep the time series active
-                    self.r.execute_command("TS.ADD", host_key, timestamp, 1)
-                    
-                    # Also add to the main host index
-                    self.r.execute_command("TS.ADD", "rtcollector:hosts:index", timestamp, len(hosts_seen))
-                except Exception as e:
-                    debug_log("Redistimeseries", f"Error updating host index: {e}", self.config)
-                    
-        except redis.exceptions.ResponseError as e:
-            print(f"[Collector] Error in output plugin: {e}")  # Keep this as regular print for errors
\ No newline at end of file
+                # Store the host name in a special key
+                host_key = f"rtcollector:hosts:{host}"
+                if host_key not in self.created_keys:
+                    pipe.execute_command(
+                        "TS.CREATE", host_key,
+                        "RETENTION", str(self.retention),
+                        "DUPLICATE_POLICY", "LAST",
+                        "LABELS", "type", "host", "host", host
+                    )
+                    host_creates.append(host_key)
+                # Add a data point to keep the time series active
+                host_samples.extend((host_key, timestamp, 1))
+            # Also add to the main host index
+            if "rtcollector:hosts:index" not in self.created_keys:
+                pipe.execute_command(
+                    "TS.CREATE", "rtcollector:hosts:index",
+                    "RETENTION", str(self.retention),
+                    "LABELS", "type", "host_index"
+                )
+                host_creates.append("rtcollector:hosts:index")
+            host_samples.extend(("rtcollector:hosts:index", timestamp, len(hosts_seen)))
+            pipe.execute_command("TS.MADD", *host_samples)
+
+        results = pipe.execute(raise_on_error=False)
+
+        existing = []
+        relabel = []
+        position = 0
+        for key, series_id, commands in provisioned:
+            result = results[position]
+            if not isinstance(result, Exception):
+                self.created_keys.add(key)
+            elif "already exists" in str(result):
+                existing.append(key)
+                relabel.append((key, commands[0]))
+                self.created_keys.add(key)
+            else:
+                print(f"[Redistimeseries] TS.CREATE failed for {key}: {result}")
+            for command, rule_result in zip(commands[1:], results[position + 1:position + len(commands)]):
+                if isinstance(rule_result, Exception) and "already" in str(rule_result):
+                    # Compactions left over from a previous run are expected; keep their labels current
+                    if command[0] == "TS.CREATE":
+                        relabel.append((command[1], command))
+                elif isinstance(rule_result, Exception):
+                    debug_log("Redistimeseries", f"{command[0]} failed for {command[1]}: {rule_result}", self.config)
+            position += len(commands)
+        if new_series:
+            debug_log("Redistimeseries", f"Provisioned {len(new_series) - len(existing)} new series ({len(existing)} already existed)", self.config)
+        if relabel:
+            self._sync_labels(relabel)
+        results = results[position:]
+
+        rejected = 0
+        missing = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                rejected += len(chunk) // 3
+                print(f"[Redistimeseries] TS.MADD chunk of {len(chunk) // 3} samples failed: {result}")
+                continue
+            for i, item in enumerate(result):
+                if isinstance(item, Exception):
+                    key = chunk[i * 3]
+                    if "not exist" in str(item).lower():
+                        # Deleted behind our back: create it again
+                        self.created_keys.discard(key)
+                        if series is not None:
+                            missing.extend(chunk[i * 3:i * 3 + 3])
+                            continue
+                    rejected += 1
+                    debug_log("Redistimeseries", f"Sample for {key} rejected: {item}", self.config)
+        host_results = results[len(chunks):len(chunks) + len(host_creates) + 1]
+        for host_key, result in zip(host_creates, host_results):
+            # Host keys count as created only once Redis has them; TS.MADD does not create keys
+            if not isinstance(result, Exception) or "already exists" in str(result):
+                self.created_keys.add(host_key)
+            else:
+                debug_log("Redistimeseries", f"Could not create {host_key}: {result}", self.config)
+        if host_samples:
+            result = host_results[-1]
+            if isinstance(result, Exception):
+                debug_log("Redistimeseries", f"Error updating host index: {result}", self.config)
+            else:
+                for i, item in enumerate(result):
+                    if isinstance(item, Exception):
+                        key = host_samples[i * 3]
+                        if "not exist" in str(item).lower():
+                            # Created again on the next write
+                            self.created_keys.discard(key)
+                        debug_log("Redistimeseries", f"Host index sample for {key} rejected: {item}", self.config)
+        if rejected:
+            print(f"[Redistimeseries] {rejected} of {len(samples) // 3} samples were rejected")
+        if missing:
+            debug_log("Redistimeseries", f"Re-creating missing series for {len(missing) // 3} samples", self.config)
+            recreate = {key: series[key] for key in missing[::3]}
+            self._write_samples(missing, set(), recreate)
+
+    def _sync_labels(self, existing):
+        """Set the labels of the TS.CREATE commands on (key, command) pairs that already existed, in one pipeline."""
+        pipe = self.r.pipeline(transaction=False)
+        for key, command in existing:
+            pipe.execute_command("TS.ALTER", key, "LABELS", *command[command.index("LABELS") + 1:])
+        for (key, _), result in zip(existing, pipe.execute(raise_on_error=False)):
+            if isinstance(result, Exception):
+                debug_log("Redistimeseries", f"TS.ALTER failed for {key}: {result}", self.config)
@@ -0,0 +1,107 @@
+import time
+from datetime import datetime
+from core.metric import MetricBatch
+from core.series import registry
+from utils.duration import parse_duration_ms
+from utils.patterns import SeriesMatcher
+
+AGGREGATES = ("last", "min", "max", "mean", "count", "sum")
+
+class Aggregate:
+    """
+    Reduce matching series to aggregates per fixed time window.
+
+    Points of matching series are folded into per-series windows aligned to
+    the period (a 60s window starts on the minute). When a window closes,
+    one point per configured aggregate is emitted as "<name>_<aggregate>",
+    with the series labels and the window start as its timestamp. Windows
+    are kept per plugin and released by that plugin's next call, so the
+    aggregates are attributed to the plugin that produced the points. Other
+    series pass through unchanged.
+    """
+
+    def __init__(self, period="60s", aggregates=("mean",), match=None, labels=None, drop_original=True):
+        self.period = parse_duration_ms(period)
+        if self.period <= 0:
+            raise ValueError(f"Aggregate period must be positive, got {period!r}")
+        if isinstance(aggregates, str):
+            aggregates = [aggregates]
+        unknown = [aggregate for aggregate in aggregates if aggregate not in AGGREGATES]
+        if unknown or not aggregates:
+            raise ValueError(f"Aggregates must be chosen from {AGGREGATES}, got {list(aggregates)}")
+        self.aggregates = list(aggregates)
+        self.matcher = SeriesMatcher(match, labels)
+        # Keep writing the raw points as well as the aggregates
+        self.drop_original = drop_original
+        # plugin -> (series_id, window start) -> [count, sum, min, max, last, output ids]
+        self._windows = {}
+        # series_id -> ids of its aggregated series, one per aggregate
+        self._output_ids = registry.cache()
+
+    def process(self, metrics, plugin_name=None):
+        """Fold matching points into their windows and return what is due for the outputs."""
+        batch = MetricBatch.from_metrics(metrics)
+        passed = MetricBatch()
+        windows = self._windows.setdefault(plugin_name, {})
+        period = self.period
+        for series_id, value, timestamp in batch.rows():
+            if not self.matcher.matches(series_id):
+                passed.series_ids.append(series_id)
+                passed.values.append(value)
+                passed.timestamps.append(timestamp)
+                continue
+            window = (series_id, timestamp - timestamp % period)
+            state = windows.get(window)
+            if state is None:
+                windows[window] = [1, value, value, value, value, self._outputs(series_id)]
+            else:
+                state[0] += 1
+                state[1] += value
+                if value < state[2]:
+                    state[2] = value
+                if value > state[3]:
+                    state[3] = value
+                state[4] = value
+            if not self.drop_original:
+                passed.series_ids.append(series_id)
+                passed.values.append(value)
+                passed.timestamps.append(timestamp)
+
+        passed.extend(self._emit(windows, int(time.time() * 1000)))
+        return passed
+
+    def flush(self):
+        """Emit every open window, closed or not (used on shutdown)."""
+        batch = MetricBatch()
+        closed = 0
+        for windows in self._windows.values():
+            closed += len(windows)
+            batch.extend(self._emit(windows, None))
+        if closed:
+            print(f"[{datetime.now().isoformat()}] [Aggregate] Flushed {closed} open windows")
+        return batch
+
+    def _emit(self, windows, now):
+        """Emit and forget the windows that ended by now (all of them if now is None)."""
+        batch = MetricBatch()
+        closed = [window for window in windows if now is None or window[1] + self.period <= now]
+        for window in closed:
+            series_id, start = window
+            count, total, minimum, maximum, last, output_ids = windows.pop(window)
+            values = {"last": last, "min": minimum, "max": maximum, "mean": total / count, "count": count, "sum": total}
+            for aggregate, output_id in zip(self.aggregates, output_ids):
+                batch.series_ids.append(output_id)
+                batch.values.append(values[aggregate])
+                batch.timestamps.append(start)
+        return batch
+
+    def _outputs(self, series_id):
+        """Return the ids of the series' aggregated series, resolved when a window opens."""
+        output_ids = self._output_ids.get(series_id)
+        if output_ids is None or not all(output_id in registry for output_id in output_ids):
+            name, labels = registry.info(series_id)
+            output_ids = self._output_ids[series_id] = tuple(registry.intern(f"{name}_{aggregate}", labels) for aggregate in self.aggregates)
+        else:
+            # Nothing interns them until the window closes; keep them from expiring meanwhile
+            registry.mark_seen(output_ids)
+        return output_ids
@@ -0,0 +1,130 @@
+import math
+import time
+from datetime import datetime
+from core.metric import MetricBatch
+from core.series import registry
+from utils.duration import parse_duration_ms
+
+_MASK64 = (1 << 64) - 1
+
+def _mix(value):
+    """splitmix64 finalizer: spread a series id over 64 well-mixed bits."""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+class HyperLogLog:
+    """
+    Approximate distinct counter in a fixed 2**precision bytes.
+
+    With the default precision of 12 (4 KiB) the standard error is about
+    1.6%, however many distinct values are added.
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self._alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, value):
+        hashed = _mix(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        estimate = self._alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Small-range correction (linear counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+class Cardinality:
+    """
+    Cap the number of distinct series each input plugin (and all of them
+    together) may produce.
+
+    Series already admitted always pass. A new series is admitted while its
+    plugin is under its limit and the global total is under max_series;
+    otherwise its points are dropped. Admitted series that have not been
+    seen for expire_after are forgotten, so the caps apply to active series
+    and churned ones (e.g. old containers) free their slots. Distinct
+    rejected series are estimated with a HyperLogLog per plugin, and all
+    figures are reported through inputs.internal.
+    """
+
+    def __init__(self, max_series=None, limits=None, default_limit=None, expire_after="1h"):
+        self.max_series = max_series
+        # Per-plugin limits, e.g. {"docker": 2000, "exec": 500}
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.expire_after = parse_duration_ms(expire_after)
+        # plugin -> {series_id: last seen (ms)}; series the registry expires are removed too
+        self._admitted = {}
+        # plugin -> HyperLogLog of rejected series ids
+        self._rejected = {}
+        self._metrics_rejected = {}
+        self._last_expiry = time.monotonic()
+
+    def process(self, metrics, plugin_name=None):
+        batch = MetricBatch.from_metrics(metrics)
+        # Data released by other processors has no plugin; it only counts toward max_series
+        plugin = plugin_name or "processors"
+        limit = self.limits.get(plugin, self.default_limit) if plugin_name else None
+        admitted = self._admitted.get(plugin)
+        if admitted is None:
+            admitted = self._admitted[plugin] = registry.cache()
+        total = sum(len(series) for series in self._admitted.values())
+        now = int(time.time() * 1000)
+        passed = MetricBatch()
+        rejected = 0
+        for series_id, value, timestamp in batch.rows():
+            if series_id in admitted:
+                admitted[series_id] = now
+            elif (limit is None or len(admitted) < limit) and (self.max_series is None or total < self.max_series):
+                admitted[series_id] = now
+                total += 1
+            else:
+                if rejected == 0 and plugin not in self._rejected:
+                    print(f"[{datetime.now().isoformat()}] [Cardinality] Series limit reached for '{plugin}', dropping new series")
+                self._rejected.setdefault(plugin, HyperLogLog()).add(series_id)
+                rejected += 1
+                continue
+            passed.series_ids.append(series_id)
+            passed.values.append(value)
+            passed.timestamps.append(timestamp)
+
+        if rejected:
+            self._metrics_rejected[plugin] = self._metrics_rejected.get(plugin, 0) + rejected
+        if time.monotonic() - self._last_expiry >= 60:
+            self._expire(now)
+        self._report(plugin, limit)
+        return passed
+
+    def _expire(self, now):
+        """Forget admitted series not seen for expire_after."""
+        self._last_expiry = time.monotonic()
+        cutoff = now - self.expire_after
+        for admitted in self._admitted.values():
+            stale = [series_id for series_id, seen in list(admitted.items()) if seen < cutoff]
+            for series_id in stale:
+                admitted.pop(series_id, None)
+
+    def _report(self, plugin, limit):
+        try:
+            from inputs.internal import set_cardinality_stats
+        except ImportError:
+            return
+        rejected = self._rejected.get(plugin)
+        set_cardinality_stats(
+            plugin,
+            series_admitted=len(self._admitted[plugin]),
+            series_rejected=rejected.count() if rejected is not None else 0,
+            metrics_rejected=self._metrics_rejected.get(plugin, 0),
+            series_limit=limit or self.max_series or 0,
+        )
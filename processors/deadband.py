@@ -0,0 +1,68 @@
+from core.metric import MetricBatch
+from core.series import registry
+from utils.duration import parse_duration_ms
+from utils.patterns import SeriesMatcher
+
+class Deadband:
+    """
+    Drop points that barely differ from the last point written for their series.
+
+    Each rule selects series by name and label patterns; the first matching
+    rule applies. A point is dropped when it is within the rule's absolute
+    threshold (or percent of the last written value) of the last written
+    point, unless the heartbeat has elapsed since that point was written, in
+    which case it is written anyway. Series matching no rule pass through.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = []
+        for rule in rules or []:
+            heartbeat = parse_duration_ms(rule.get("heartbeat", "5m"))
+            if heartbeat <= 0:
+                raise ValueError(f"Deadband heartbeat must be positive, got {rule.get('heartbeat')!r}")
+            self.rules.append((
+                SeriesMatcher(rule.get("match"), rule.get("labels")),
+                float(rule.get("threshold", 0)),
+                float(rule["percent"]) / 100 if "percent" in rule else None,
+                heartbeat,
+            ))
+        # series_id -> index of its rule, or None
+        self._series_rules = registry.cache()
+        # series_id -> (last written value, its timestamp)
+        self._last_written = registry.cache()
+
+    def _rule(self, series_id):
+        try:
+            return self._series_rules[series_id]
+        except KeyError:
+            index = next((i for i, rule in enumerate(self.rules) if rule[0].matches(series_id)), None)
+            self._series_rules[series_id] = index
+            return index
+
+    def process(self, metrics, plugin_name=None):
+        batch = MetricBatch.from_metrics(metrics)
+        passed = MetricBatch()
+        last_written = self._last_written
+        suppressed = 0
+        for series_id, value, timestamp in batch.rows():
+            index = self._rule(series_id)
+            if index is not None:
+                _, threshold, percent, heartbeat = self.rules[index]
+                last = last_written.get(series_id)
+                if last is not None and timestamp - last[1] < heartbeat:
+                    band = threshold if percent is None else abs(last[0]) * percent
+                    if abs(value - last[0]) <= band:
+                        suppressed += 1
+                        continue
+                last_written[series_id] = (value, timestamp)
+            passed.series_ids.append(series_id)
+            passed.values.append(value)
+            passed.timestamps.append(timestamp)
+
+        if suppressed:
+            try:
+                from inputs.internal import update_collector_stats
+                update_collector_stats("metrics_suppressed", suppressed)
+            except ImportError:
+                pass
+        return passed
@@ -0,0 +1,68 @@
+from core.metric import MetricBatch
+from core.series import registry
+from utils.patterns import SeriesMatcher
+
+class Filter:
+    """
+    Keep or drop series by name and label patterns, and route them to outputs.
+
+    A series is kept when it matches the include side (name globs in
+    include, regexes in include_regex, label globs in labels; empty means
+    everything) and matches none of exclude, exclude_regex or
+    exclude_labels. Each route sends the series it matches only to the
+    outputs it lists; series matching no route go to every output. Patterns
+    are compiled once and every decision is cached per series id.
+    """
+
+    def __init__(self, include=None, exclude=None, include_regex=None, exclude_regex=None, labels=None, exclude_labels=None, routes=None):
+        self.include = SeriesMatcher(include, labels, include_regex)
+        self.exclude = SeriesMatcher(exclude, None, exclude_regex) if exclude or exclude_regex else None
+        self.exclude_labels = [SeriesMatcher(labels={label: patterns}) for label, patterns in (exclude_labels or {}).items()]
+        self.routes = []
+        for route in routes or []:
+            if not route.get("outputs"):
+                raise ValueError(f"Filter route needs a list of outputs: {route}")
+            matcher = SeriesMatcher(route.get("match"), route.get("labels"), route.get("regex"))
+            self.routes.append((matcher, set(route["outputs"])))
+        # series_id -> keep?
+        self._keep = registry.cache()
+        # series_id -> set of output names, or None for every output
+        self._series_routes = registry.cache()
+
+    def _keeps(self, series_id):
+        keep = self._keep.get(series_id)
+        if keep is None:
+            keep = (
+                self.include.matches(series_id)
+                and not (self.exclude is not None and self.exclude.matches(series_id))
+                and not any(matcher.matches(series_id) for matcher in self.exclude_labels)
+            )
+            self._keep[series_id] = keep
+        return keep
+
+    def process(self, metrics, plugin_name=None):
+        batch = MetricBatch.from_metrics(metrics)
+        passed = MetricBatch()
+        for series_id, value, timestamp in batch.rows():
+            if self._keeps(series_id):
+                passed.series_ids.append(series_id)
+                passed.values.append(value)
+                passed.timestamps.append(timestamp)
+
+        filtered = len(batch) - len(passed)
+        if filtered:
+            try:
+                from inputs.internal import update_collector_stats
+                update_collector_stats("metrics_filtered", filtered)
+            except ImportError:
+                pass
+        return passed
+
+    def routes_to(self, series_id, output_name):
+        """Return True if points of the series should be written to the named output."""
+        try:
+            outputs = self._series_routes[series_id]
+        except KeyError:
+            outputs = next((outputs for matcher, outputs in self.routes if matcher.matches(series_id)), None)
+            self._series_routes[series_id] = outputs
+        return outputs is None or output_name in outputs
@@ -0,0 +1,43 @@
+"""
+Duration parsing shared by outputs and config options.
+"""
+
+# Longest suffixes first so "ms" is not read as minutes
+_UNITS_MS = [
+    ("ms", 1),
+    ("s", 1000),
+    ("m", 60000),
+    ("h", 3600000),
+    ("d", 86400000),
+    ("w", 7 * 86400000),
+    ("y", 365 * 86400000),
+]
+
+def parse_duration_ms(value):
+    """
+    Convert a human-readable duration to milliseconds.
+
+    Args:
+        value: A number of milliseconds, or a string such as "500ms", "30s",
+            "5m", "12h", "7d", "2w" or "1y"
+
+    Returns:
+        int: Duration in milliseconds
+
+    Raises:
+        ValueError: If the value is not a valid duration
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().lower()
+    for suffix, factor in _UNITS_MS:
+        if text.endswith(suffix):
+            number = text[:-len(suffix)].strip()
+            try:
+                return int(float(number) * factor)
+            except ValueError:
+                break
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Invalid duration: {value!r}") from None
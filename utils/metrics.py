@@ -1,11 +1,17 @@
 """
 Utility functions for metric processing.
 """
+from core.checkpoint import register_state
+from core.labels import LabelSet
 
 # Store previous values for rate calculations
 _last_values = {}
 _last_timestamps = {}
 
+# (metric_name, labels) -> key built by create_key; cleared when full
+_keys = {}
+KEY_CACHE_SIZE = 10000
+
 def calculate_rate(name, value, timestamp, reset_value=None):
     """
     Calculate rate of change for counter metrics.
@@ -66,8 +72,44 @@ def create_key(metric_name, labels):
     """
     if not labels:
         return metric_name
-        
-    # Sort labels for consistent key generation
-    sorted_labels = sorted(labels.items())
-    labels_str = ",".join(f"{k}={v}" for k, v in sorted_labels)
-    return f"{metric_name}:{labels_str}"
\ No newline at end of file
+
+    # Keys are cached so the labels are sorted once per series, not per call.
+    # The cache is separate from the series registry and bounded, since
+    # churning labels would otherwise grow it forever.
+    try:
+        cache_key = (metric_name, labels if isinstance(labels, LabelSet) else frozenset(labels.items()))
+    except TypeError:
+        cache_key = None
+    key = _keys.get(cache_key) if cache_key is not None else None
+    if key is None:
+        # Sort labels for consistent key generation
+        sorted_labels = sorted(labels.items())
+        labels_str = ",".join(f"{k}={v}" for k, v in sorted_labels)
+        key = f"{metric_name}:{labels_str}"
+        if cache_key is not None:
+            if len(_keys) >= KEY_CACHE_SIZE:
+                _keys.clear()
+            _keys[cache_key] = key
+    return key
+
+
+def canonical_schema(config):
+    """
+    Return True if plugins should emit the canonical schema.
+
+    In the canonical schema (global `schema: canonical`) each measurement is
+    emitted once, as a plain metric name with everything that identifies the
+    series (interface, device, mount, core) in labels, and no compatibility
+    copies under other names.
+    """
+    return bool(config) and config.get("schema") == "canonical"
+
+
+def _save_rate_state():
+    return {"values": dict(_last_values), "timestamps": dict(_last_timestamps)}
+
+def _restore_rate_state(state):
+    _last_values.update(state["values"])
+    _last_timestamps.update(state["timestamps"])
+
+register_state("utils.metrics.rates", _save_rate_state, _restore_rate_state, volatile=True)
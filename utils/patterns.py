@@ -0,0 +1,71 @@
+"""
+Metric name and label matching shared by processors.
+"""
+import fnmatch
+import re
+from core.series import registry
+
+def compile_patterns(patterns):
+    """
+    Compile shell-style patterns into one regular expression.
+
+    Args:
+        patterns: A pattern such as "cpu_usage_*", a list of patterns, or None
+
+    Returns:
+        A compiled regular expression matching any of the patterns, or None
+        when no patterns are given (match everything)
+    """
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return re.compile("|".join(f"(?:{fnmatch.translate(str(pattern))})" for pattern in patterns))
+
+def compile_regexes(regexes):
+    """Compile regular expressions into one alternation, or None when none are given."""
+    if not regexes:
+        return None
+    if isinstance(regexes, str):
+        regexes = [regexes]
+    return re.compile("|".join(f"(?:{regex})" for regex in regexes))
+
+class SeriesMatcher:
+    """
+    Decide whether a series matches name and label patterns.
+
+    A series matches when its name matches any of the name patterns or
+    regexes (searched anywhere in the name) and, for every label in labels,
+    the series has that label with a value matching one of its patterns.
+    Patterns and regexes are each compiled into a single alternation, and
+    the decision is computed once per registry series id and cached, so
+    matching a point costs one dict lookup.
+    """
+
+    def __init__(self, names=None, labels=None, regexes=None):
+        self.names = compile_patterns(names)
+        self.regexes = compile_regexes(regexes)
+        self.labels = {label: compile_patterns(patterns) for label, patterns in (labels or {}).items()}
+        self.match_all = self.names is None and self.regexes is None and not self.labels
+        self._decisions = registry.cache()
+
+    def matches(self, series_id):
+        if self.match_all:
+            return True
+        decision = self._decisions.get(series_id)
+        if decision is None:
+            name, labels = registry.info(series_id)
+            decision = self._decisions[series_id] = self._check(name, labels)
+        return decision
+
+    def _check(self, name, labels):
+        if self.names is not None or self.regexes is not None:
+            if not ((self.names is not None and self.names.match(name))
+                    or (self.regexes is not None and self.regexes.search(name))):
+                return False
+        for label, pattern in self.labels.items():
+            if label not in labels:
+                return False
+            if pattern is not None and not pattern.match(str(labels[label])):
+                return False
+        return True
@@ -0,0 +1,136 @@
+"""
+Shared Redis connections with lazy reconnect, backoff and a circuit breaker.
+"""
+import random
+import threading
+import time
+from datetime import datetime
+import redis
+
+# Errors after which the client is dropped and the server treated as down
+CONNECTION_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, OSError)
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+class RedisConnection:
+    """
+    A Redis client that reconnects on demand.
+
+    client() returns a connected redis.Redis, or None while the server is
+    considered down; callers report connection errors with failed(). The
+    first failure_threshold consecutive failures are retried on the next
+    call. After that the circuit opens, and no connection is attempted
+    until a backoff delay has passed. The delay doubles from backoff_base up
+    to backoff_max and is jittered, so an outage costs one attempt per
+    delay rather than one per write, and agents do not reconnect in
+    lockstep. One successful PING closes the circuit again. While the
+    circuit is closed, redis-py PINGs connections that have been idle for
+    health_check_interval seconds before using them, so a connection the
+    server dropped is noticed before a write fails on it.
+    """
+
+    def __init__(self, name="redis", host="localhost", port=6379, db=0, username=None, password=None, ssl=False, ssl_ca_certs=None, ssl_certfile=None, ssl_keyfile=None, health_check_interval=30, connect_timeout=5, backoff_base=1, backoff_max=60, failure_threshold=3):
+        self.name = name
+        self.host = host
+        self.port = port
+        # Configure SSL if enabled
+        ssl_params = {}
+        if ssl:
+            ssl_params = {
+                "ssl": True,
+                "ssl_ca_certs": ssl_ca_certs,
+                "ssl_certfile": ssl_certfile,
+                "ssl_keyfile": ssl_keyfile
+            }
+            # Remove None values
+            ssl_params = {k: v for k, v in ssl_params.items() if v is not None}
+        self.params = {"host": host, "port": port, "db": db, "username": username, "password": password, **ssl_params}
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self._client = None
+        self._failures = 0
+        self._next_attempt = 0
+        self._lock = threading.Lock()
+
+    def client(self):
+        """Return a connected client, reconnecting if one is due, or None while Redis is down."""
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            if time.monotonic() < self._next_attempt:
+                return None
+            try:
+                client = redis.Redis(
+                    health_check_interval=self.health_check_interval,
+                    socket_connect_timeout=self.connect_timeout,
+                    **self.params
+                )
+                client.ping()
+            except redis.exceptions.AuthenticationError as e:
+                print(f"\033[91m[{self.name}] ERROR: Authentication failed for Redis at {self.host}:{self.port}. Please check username and password.\033[0m")
+                print(f"\033[93m[{self.name}] HINT: If Redis requires authentication, make sure to set username and/or password in config.yml\033[0m")
+                self._trip(e)
+                return None
+            except CONNECTION_ERRORS as e:
+                self._trip(e)
+                return None
+            if self._failures:
+                print(f"[{datetime.now().isoformat()}] [{self.name}] Reconnected to Redis at {self.host}:{self.port} after {self._failures} failed attempts")
+            self._client = client
+            self._failures = 0
+            self._next_attempt = 0
+            return client
+
+    def failed(self, error):
+        """Drop the client after a connection error; client() reconnects once the backoff allows."""
+        with self._lock:
+            client, self._client = self._client, None
+            if client is None:
+                return
+            try:
+                client.close()
+            except Exception:
+                pass
+            self._trip(error)
+
+    def _trip(self, error):
+        self._failures += 1
+        if self._failures < self.failure_threshold:
+            self._next_attempt = 0
+            print(f"\033[91m[{self.name}] ERROR: Could not connect to Redis at {self.host}:{self.port}: {error}\033[0m")
+            return
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (self._failures - self.failure_threshold))
+        # Equal jitter: wait between half and all of the delay
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self._next_attempt = time.monotonic() + delay
+        print(f"\033[91m[{self.name}] ERROR: Redis at {self.host}:{self.port} is unavailable ({error}); retrying in {delay:.1f}s\033[0m")
+
+def get_connection(name="redis", **params):
+    """
+    Return the shared RedisConnection for a server, creating it on first use.
+
+    Outputs and inputs that point at the same server, database and
+    credentials share one connection pool and one circuit breaker, so a
+    down server is detected once and probed by a single caller. Backoff
+    and health check settings are taken from the first caller.
+
+    Args:
+        name: Component name used in log messages (e.g. "Redistimeseries")
+        **params: RedisConnection arguments (host, port, db, username, password, ssl, ...)
+    """
+    key = tuple(sorted((k, params.get(k)) for k in ("host", "port", "db", "username", "password", "ssl", "ssl_ca_certs", "ssl_certfile", "ssl_keyfile")))
+    with _connections_lock:
+        connection = _connections.get(key)
+        if connection is None:
+            connection = _connections[key] = RedisConnection(name=name, **params)
+        elif name not in connection.name.split("/"):
+            # Log messages name every component sharing the connection
+            connection.name = f"{connection.name}/{name}"
+        return connection